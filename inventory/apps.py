@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+        from .sqlite_tuning import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='inventory_sqlite_tuning')
@@ -0,0 +1,174 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import gzip
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .exporting import iter_movements
+from .filters import ACTION_TYPES, parse_moment
+from .models import InventoryItem, MovementLog, StockSnapshot
+from .stock_history import item_names
+
+QUERY_CHUNK_SIZE = 900
+
+ARCHIVE_PREFIX = 'movements-'
+ARCHIVE_SUFFIX = '.jsonl.gz'
+
+
+class ArchiveConflict(Exception):
+    """Outro processo arquivou as mesmas movimentações ao mesmo tempo."""
+
+
+def archive_path(month):
+    return Path(settings.MOVEMENT_ARCHIVE_DIR) / f'{ARCHIVE_PREFIX}{month}{ARCHIVE_SUFFIX}'
+
+
+def _month(timestamp):
+    return timezone.localtime(parse_datetime(timestamp)).strftime('%Y-%m')
+
+
+def _append(path, records):
+    # Cada bloco vira um novo membro gzip no fim do arquivo; o gzip lê os
+    # membros concatenados como um único fluxo
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+    with open(path, 'ab') as archive:
+        archive.write(gzip.compress(data.encode('utf-8')))
+        archive.flush()
+        os.fsync(archive.fileno())
+
+
+def _open_checkpoint(cutoff, batch_size=2000):
+    """Grava o checkpoint do corte, se ainda não existir: a quantidade atual
+    de cada item (zero para os excluídos) menos as movimentações a partir do
+    corte. Não depende do histórico anterior, que pode estar incompleto."""
+    if StockSnapshot.objects.filter(taken_at=cutoff).exists():
+        return
+    balances = {}
+    names = {}
+    for item_id, name, quantity in InventoryItem.objects.values_list('id', 'name', 'quantity').iterator(chunk_size=batch_size):
+        balances[item_id] = quantity
+        names[item_id] = name
+    later = (MovementLog.objects
+             .filter(timestamp__gte=cutoff, item_ref__isnull=False)
+             .values('item_ref')
+             .annotate(total=Sum('change'))
+             .values_list('item_ref', 'total')
+             .order_by())
+    for item_ref, total in later:
+        balances[item_ref] = balances.get(item_ref, 0) - total
+    names.update(item_names(item_ref for item_ref in balances if item_ref not in names))
+
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(item_ref=item_ref, item_name=names.get(item_ref, ''), taken_at=cutoff,
+                      quantity=quantity, archived=True)
+        for item_ref, quantity in balances.items() if quantity
+    ], batch_size=500)
+
+
+def archive_movements(cutoff, chunk_size=None, progress=None):
+    """Move as movimentações anteriores a ``cutoff`` para os arquivos mensais
+    e grava o saldo de cada item no corte (checkpoint em StockSnapshot).
+
+    O checkpoint é gravado na transação do primeiro bloco. Cada bloco de
+    ``chunk_size`` linhas é gravado no arquivo (com fsync) e só então
+    removido da tabela.
+    Se o processo cair no meio, o bloco pode aparecer duas vezes no arquivo,
+    mas ``iter_archived`` ignora ids repetidos."""
+    chunk_size = chunk_size or settings.MOVEMENT_ARCHIVE_CHUNK_SIZE
+    archived = 0
+    while True:
+        with transaction.atomic():
+            records = list(iter_movements(MovementLog.objects.filter(timestamp__lt=cutoff), limit=chunk_size))
+            if not records:
+                break
+            _open_checkpoint(cutoff)
+
+            by_month = defaultdict(list)
+            for record in records:
+                by_month[_month(record['timestamp'])].append(record)
+            for month, month_records in by_month.items():
+                _append(archive_path(month), month_records)
+
+            ids = [record['id'] for record in records]
+            deleted = 0
+            for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+                deleted += MovementLog.objects.filter(pk__in=ids[start:start + QUERY_CHUNK_SIZE]).delete()[0]
+            if deleted != len(ids):
+                raise ArchiveConflict()
+
+        archived += len(records)
+        if progress:
+            progress(archived)
+    return archived
+
+
+def iter_archived(start=None, end=None):
+    """Percorre as movimentações arquivadas com ``start <= timestamp < end``,
+    mês a mês, no mesmo formato de ``exporting.iter_movements``."""
+    directory = Path(settings.MOVEMENT_ARCHIVE_DIR)
+    if not directory.is_dir():
+        return
+    first = timezone.localtime(start).strftime('%Y-%m') if start else None
+    last = timezone.localtime(end).strftime('%Y-%m') if end else None
+
+    for path in sorted(directory.glob(f'{ARCHIVE_PREFIX}*{ARCHIVE_SUFFIX}')):
+        month = path.name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        if (first and month < first) or (last and month > last):
+            continue
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                timestamp = parse_datetime(record['timestamp'])
+                if (start and timestamp < start) or (end and timestamp >= end):
+                    continue
+                yield record
+
+
+def archived_movements(params, username=None):
+    """Movimentações arquivadas com os mesmos filtros de
+    ``filters.filter_movements``; ``username`` restringe ao usuário. Os
+    parâmetros são validados já na chamada (ValueError)."""
+    start = parse_moment(params['start']) if params.get('start') else None
+    end = parse_moment(params['end'], end_of_day=True) if params.get('end') else None
+
+    users = {name for name in (username, params.get('user')) if name}
+    item = params.get('item')
+    if item:
+        try:
+            item = int(item)
+        except ValueError:
+            raise ValueError(f'Item inválido: {item}')
+    action_type = params.get('action_type')
+    if action_type and action_type not in ACTION_TYPES:
+        raise ValueError(f'Tipo de ação inválido: {action_type}')
+
+    return _filter_archived(iter_archived(start, end), users, item, action_type)
+
+
+def _filter_archived(records, users, item, action_type):
+    for record in records:
+        if users and (len(users) > 1 or record['user'] not in users):
+            continue
+        if item and record['item_id'] != item:
+            continue
+        if action_type and record['action_type'] != action_type:
+            continue
+        yield record
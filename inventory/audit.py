@@ -0,0 +1,103 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import atexit
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import InventoryItem, MovementLog
+from .rollup import add_to_rollup
+from .write_behind import WriteBehindBuffer
+
+QUERY_CHUNK_SIZE = 900
+
+
+# Toda movimentação passa por aqui, para que o rollup diário seja atualizado
+# na mesma transação que grava o log.
+
+def log_movement(item_id, change, action_type, user=None, observation=None, sync=None):
+    """Registra uma movimentação. Com ``MOVEMENT_LOG_BUFFERED`` (e ``sync``
+    diferente de True) o log só entra no buffer depois do commit da transação
+    atual e é gravado em lote pela thread de fundo; o log devolvido ainda não
+    tem ``pk``. ``sync=True`` força a gravação na transação atual."""
+    log = MovementLog(
+        item_id=item_id,
+        item_ref=item_id,
+        change=change,
+        action_type=action_type,
+        observation=observation,
+        user=user
+    )
+    if sync is None:
+        sync = not settings.MOVEMENT_LOG_BUFFERED
+    if not sync:
+        # Se a transação for desfeita o log é descartado junto
+        transaction.on_commit(lambda: get_writer().submit(log))
+        return log
+    with transaction.atomic():
+        log.save()
+        add_to_rollup([log])
+    return log
+
+
+def log_movements(logs, batch_size=500):
+    with transaction.atomic():
+        MovementLog.objects.bulk_create(logs, batch_size=batch_size)
+        add_to_rollup(logs)
+    return logs
+
+
+def _existing_ids(model, ids):
+    ids = list({pk for pk in ids if pk is not None})
+    existing = set()
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        existing.update(model.objects.filter(pk__in=ids[start:start + QUERY_CHUNK_SIZE]).values_list('id', flat=True))
+    return existing
+
+
+def write_buffered(logs):
+    # Item ou usuário excluído antes da gravação: a FK fica nula, como o
+    # SET_NULL faria com o log já gravado (o item continua em item_ref)
+    items = _existing_ids(InventoryItem, (log.item_id for log in logs))
+    users = _existing_ids(User, (log.user_id for log in logs))
+    for log in logs:
+        if log.item_id not in items:
+            log.item_id = None
+        if log.user_id not in users:
+            log.user_id = None
+    log_movements(logs)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindBuffer(
+                    write_buffered,
+                    max_rows=settings.MOVEMENT_LOG_FLUSH_ROWS,
+                    max_wait_ms=settings.MOVEMENT_LOG_FLUSH_MS,
+                    name='movement-log-writer',
+                )
+                # Encerramento normal do processo: grava o que ficou no buffer
+                atexit.register(_writer.close)
+    return _writer
+
+
+def flush_movement_logs():
+    """Grava imediatamente os logs pendentes deste processo."""
+    return _writer.flush() if _writer is not None else 0
+
+
+def movement_writer_stats():
+    return _writer.stats() if _writer is not None else None
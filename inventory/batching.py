@@ -0,0 +1,106 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Agrupa chamadas concorrentes em lotes para uma função vetorizada.
+
+    Cada chamada a ``submit`` entra em uma fila; uma thread de fundo junta até
+    ``max_batch_size`` itens ou espera no máximo ``max_wait_ms`` desde o
+    primeiro item, chama ``batch_fn(itens)`` uma vez e devolve a cada chamador
+    o resultado correspondente.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5, name='microbatcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.reset_stats()
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Depois de um fork (ex.: gunicorn) a thread do processo pai não existe
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.batch_fn(items)
+        except Exception as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def reset_stats(self):
+        with self._lock:
+            self._batches = 0
+            self._items = 0
+            self._batch_sizes = Counter()
+            self._wait_total = 0.0
+            self._wait_max = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': self._items / self._batches if self._batches else 0.0,
+                'batch_sizes': dict(sorted(self._batch_sizes.items())),
+                'avg_queue_wait_ms': self._wait_total / self._items * 1000 if self._items else 0.0,
+                'max_queue_wait_ms': self._wait_max * 1000,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+            }
@@ -0,0 +1,236 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.template import TemplateDoesNotExist
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .low_stock import rebuild_low_stock
+from .models import Category, InventoryItem, MovementLog
+from .rollup import rebuild_rollup
+from .search import rebuild_index
+from .stats import percentile
+
+# Suíte de benchmarks (comando benchmark): gera um conjunto de dados com
+# semente fixa, mede cada view pelo cliente de testes e as funções do chatbot
+# e compara p95 e número de consultas com um baseline em JSON.
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_ADMIN_USERNAME = 'benchmark_admin'
+
+CATEGORIES = 50
+
+NAMES = ['CABO HDMI', 'AÇÚCAR', 'CAFÉ', 'PARAFUSO', 'MOUSE', 'TECLADO', 'MONITOR', 'CADERNO', 'CANETA',
+         'PAPEL A4', 'FEIJÃO', 'ARROZ', 'ÓLEO', 'SABÃO', 'LÂMPADA']
+
+HISTORY_DAYS = 365
+
+# Diferenças de p95 menores que isto são ruído de medição, não regressão
+MIN_REGRESSION_MS = 1.0
+
+# Falhas que só indicam um ambiente incompleto (spaCy/TensorFlow ou dados do
+# NLTK não instalados, arquivos do modelo ou templates ausentes): o caso fica
+# como ignorado. Qualquer outra falha, inclusive uma resposta diferente de
+# 200, é um erro do caso e conta como regressão
+SKIP_ERRORS = (ImportError, LookupError, FileNotFoundError, TemplateDoesNotExist)
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield range(start, min(start + size, total))
+
+
+def seed_dataset(items=100_000, movements=5_000_000, users=1_000, seed=42, batch_size=10_000, progress=None):
+    """Gera usuários, categorias, itens e movimentações aleatórios (sempre os
+    mesmos para a mesma semente) e recalcula rollup, baixo estoque e índice de
+    busca. O primeiro usuário é ``BENCHMARK_USERNAME``; há também um
+    superusuário ``BENCHMARK_ADMIN_USERNAME``. ``progress(etapa, feitos)`` é
+    chamado a cada bloco gravado."""
+    rng = random.Random(seed)
+    password = make_password(None)
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            [User(username=BENCHMARK_USERNAME if number == 0 else f'{BENCHMARK_USERNAME}{number}', password=password)
+             for number in range(users)]
+            + [User(username=BENCHMARK_ADMIN_USERNAME, password=password, is_staff=True, is_superuser=True)],
+            batch_size=batch_size,
+        )
+        Category.objects.bulk_create([Category(name=f'CATEGORIA {number}') for number in range(CATEGORIES)])
+    user_ids = list(User.objects.filter(username__startswith=BENCHMARK_USERNAME, is_superuser=False)
+                    .order_by('id').values_list('id', flat=True))
+    category_ids = list(Category.objects.order_by('id').values_list('id', flat=True)) + [None]
+
+    for chunk in _chunks(items, batch_size):
+        InventoryItem.objects.bulk_create([
+            InventoryItem(name=f'{rng.choice(NAMES)} {number}', quantity=rng.randint(0, 200),
+                          category_id=rng.choice(category_ids), user_id=rng.choice(user_ids))
+            for number in chunk
+        ])
+        if progress:
+            progress('itens', chunk.stop)
+    owners = list(InventoryItem.objects.filter(user__in=user_ids).order_by('id').values_list('id', 'user_id'))
+
+    now = timezone.now()
+    for chunk in _chunks(movements if owners else 0, batch_size):
+        logs = []
+        for _ in chunk:
+            item_id, user_id = rng.choice(owners)
+            if rng.random() < 0.7:
+                change, action_type = -rng.randint(1, 10), 'DECREASE'
+            else:
+                change, action_type = rng.randint(1, 20), 'INCREASE'
+            logs.append(MovementLog(item_id=item_id, user_id=user_id, change=change, action_type=action_type,
+                                    timestamp=now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400))))
+        MovementLog.objects.bulk_create(logs)
+        if progress:
+            progress('movimentações', chunk.stop)
+
+    # bulk_create não dispara sinais: recalcula as estruturas derivadas
+    rebuild_rollup()
+    rebuild_low_stock()
+    rebuild_index()
+    return {'users': users, 'items': items, 'movements': movements, 'seed': seed,
+            'elapsed': time.perf_counter() - started}
+
+
+def measure(call, iterations, setup=None):
+    """Chama ``call`` uma vez para aquecer e depois ``iterations`` vezes,
+    devolvendo p50/p95/média em ms e o maior número de consultas SQL."""
+    call()
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured.captured_queries))
+    return {
+        'iterations': iterations,
+        'p50_ms': percentile(timings, 0.50),
+        'p95_ms': percentile(timings, 0.95),
+        'mean_ms': sum(timings) / len(timings) if timings else 0.0,
+        'queries': queries,
+    }
+
+
+def _request(client, method, url, **kwargs):
+    def call():
+        response = getattr(client, method)(url, **kwargs)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} respondeu {response.status_code}')
+    return call
+
+
+def _chat_messages():
+    from .utils import registry
+    return [pattern for intent in registry.get('intents')['intents'] for pattern in intent['patterns'][:1]]
+
+
+def _rotating(function):
+    # Alterna entre as mensagens do intents.json, carregado só se o caso rodar
+    messages = []
+    position = [0]
+
+    def call():
+        if not messages:
+            messages.extend(_chat_messages())
+        message = messages[position[0] % len(messages)]
+        position[0] += 1
+        return function(message)
+    return call
+
+
+def _clear_chat_caches():
+    # Mede a inferência, não o acerto no cache de respostas. Os caches são
+    # deste processo: o caso 'chat' roda sem o pool de processos
+    from . import utils
+    utils.response_cache.clear()
+    utils.intent_cache.clear()
+
+
+def build_cases():
+    """Casos de benchmark: nome -> (chamada, preparação antes de cada medição)."""
+    from . import utils
+
+    client = Client()
+    client.force_login(User.objects.get(username=BENCHMARK_USERNAME))
+    admin_client = Client()
+    admin_client.force_login(User.objects.get(username=BENCHMARK_ADMIN_USERNAME))
+    chat_body = json.dumps({'message': 'Oi'})
+
+    return {
+        'dashboard': (_request(client, 'get', reverse('dashboard')), None),
+        'dashboard_last_page': (_request(client, 'get', reverse('dashboard'), data={'page': 'last'}), None),
+        'dashboard_search': (_request(client, 'get', reverse('dashboard'), data={'filter': 'cabo'}), None),
+        'item_filter': (_request(client, 'get', reverse('item-filter')), None),
+        'item_filter_search': (_request(client, 'get', reverse('item-filter'), data={'name': 'acucar'}), None),
+        'movement_log': (_request(client, 'get', reverse('movement_log')), None),
+        'movement_log_admin': (_request(admin_client, 'get', reverse('movement_log')), None),
+        'most_sold': (_request(client, 'get', reverse('most_sold_items_report')), None),
+        'chat': (override_settings(CHATBOT_INFERENCE_POOL_SIZE=0)(
+                     _request(client, 'post', reverse('chat'), data=chat_body, content_type='application/json')),
+                 _clear_chat_caches),
+        'get_response': (_rotating(utils.get_response), _clear_chat_caches),
+        'predict_class': (_rotating(lambda message: utils.predict_class(message, batched=False)), _clear_chat_caches),
+        'bag_of_words': (_rotating(utils.bag_of_words), None),
+    }
+
+
+def run_benchmarks(iterations=20, names=None):
+    """Mede os casos (todos ou apenas ``names``). Casos que não podem rodar
+    neste ambiente (ex.: modelo do chatbot ausente) ficam com ``skipped``;
+    os que falham por outro motivo, com ``error``."""
+    cases = build_cases()
+    results = {}
+    for name in names or cases:
+        call, setup = cases[name]
+        try:
+            results[name] = measure(call, iterations, setup)
+        except Exception as exc:
+            # Primeira linha com texto (as mensagens do NLTK começam com uma moldura de '*')
+            message = next((line.strip() for line in str(exc).splitlines() if line.strip(' *')), '')
+            key = 'skipped' if isinstance(exc, SKIP_ERRORS) else 'error'
+            results[name] = {key: f'{type(exc).__name__}: {message}'}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Regressões em relação ao baseline: p95 acima de ``(1 + threshold)``
+    vezes o anterior (e por mais de MIN_REGRESSION_MS), mais consultas SQL,
+    um caso com erro ou um caso que rodou no baseline e agora foi ignorado."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if 'error' in current:
+            regressions.append(f"{name}: {current['error']}")
+            continue
+        if not previous or 'p95_ms' not in previous:
+            continue
+        if 'skipped' in current:
+            regressions.append(f"{name}: rodou no baseline e agora foi ignorado ({current['skipped']})")
+            continue
+        limit = max(previous['p95_ms'] * (1 + threshold), previous['p95_ms'] + MIN_REGRESSION_MS)
+        if current['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {current['p95_ms']:.2f} ms (baseline {previous['p95_ms']:.2f} ms)")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} consultas (baseline {previous['queries']})")
+    return regressions
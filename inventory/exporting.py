@@ -0,0 +1,96 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+
+EXPORT_FIELDS = ['id', 'timestamp', 'user', 'item_id', 'item', 'change', 'action_type', 'observation']
+
+# Colunas lidas do banco, na mesma ordem de EXPORT_FIELDS (item_ref continua
+# com o id do item depois que ele é excluído)
+_COLUMNS = ['id', 'timestamp', 'user__username', 'item_ref', 'item__name', 'change', 'action_type', 'observation']
+
+# Quantidade de linhas agrupadas em cada pedaço enviado ao cliente
+ROWS_PER_CHUNK = 500
+
+
+def iter_movements(logs, chunk_size=2000, limit=None):
+    """Percorre o queryset com cursor do servidor, sem carregar tudo em memória
+    e sem consultas extras por linha. ``limit`` lê apenas as mais antigas."""
+    rows = logs.order_by('timestamp', 'id').values_list(*_COLUMNS)
+    if limit is not None:
+        rows = rows[:limit]
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = dict(zip(EXPORT_FIELDS, row))
+        record['timestamp'] = record['timestamp'].isoformat()
+        yield record
+
+
+def _batched(records, size=ROWS_PER_CHUNK):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    # O cabeçalho sai antes da primeira consulta terminar
+    yield buffer.getvalue()
+    for batch in _batched(records):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(records):
+    for batch in _batched(records):
+        yield ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch)
+
+
+def encode_chunks(chunks, compress=False):
+    """Codifica em UTF-8 e, opcionalmente, comprime em gzip de forma incremental."""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+
+    compressor = zlib.compressobj(wbits=31)  # 31 = formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_movements(records, fmt='csv', compress=False):
+    chunks = jsonl_chunks(records) if fmt == 'jsonl' else csv_chunks(records)
+    return encode_chunks(chunks, compress)
+
+
+async def async_chunks(chunks):
+    """Versão assíncrona de um iterador de pedaços, para o ASGI. Com um
+    iterador síncrono o Django consome tudo com ``sync_to_async(list)`` antes
+    de enviar; aqui cada pedaço é gerado na thread do ORM e enviado em seguida."""
+    iterator = iter(chunks)
+    end = object()
+    while True:
+        chunk = await sync_to_async(next)(iterator, end)
+        if chunk is end:
+            return
+        yield chunk
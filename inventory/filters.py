@@ -0,0 +1,80 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import MovementLog
+
+ACTION_TYPES = {choice for choice, _ in MovementLog.ACTION_CHOICES}
+
+
+def parse_day(value):
+    """Converte 'AAAA-MM-DD' em date; levanta ValueError se for inválida."""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f'Data inválida: {value}')
+    return day
+
+
+def parse_moment(value, end_of_day=False):
+    """Converte 'AAAA-MM-DD' ou uma data/hora ISO em datetime com fuso.
+
+    Para datas sem hora, ``end_of_day`` devolve o início do dia seguinte,
+    usado como limite exclusivo.
+    """
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        if end_of_day:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    elif moment is None:
+        raise ValueError(f'Data inválida: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_movements(logs, params):
+    """Aplica os filtros da query string (start, end, user, item, action_type)
+    a um queryset de MovementLog. Levanta ValueError para valores inválidos."""
+    start = params.get('start')
+    if start:
+        logs = logs.filter(timestamp__gte=parse_moment(start))
+
+    end = params.get('end')
+    if end:
+        # Uma data sem hora inclui o dia inteiro
+        logs = logs.filter(timestamp__lt=parse_moment(end, end_of_day=True))
+
+    user = params.get('user')
+    if user:
+        logs = logs.filter(user__username=user)
+
+    item = params.get('item')
+    if item:
+        try:
+            logs = logs.filter(item_ref=int(item))
+        except ValueError:
+            raise ValueError(f'Item inválido: {item}')
+
+    action_type = params.get('action_type')
+    if action_type:
+        if action_type not in ACTION_TYPES:
+            raise ValueError(f'Tipo de ação inválido: {action_type}')
+        logs = logs.filter(action_type=action_type)
+
+    return logs
@@ -0,0 +1,133 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import datetime
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .inventory_cache import bump_category_version
+from .low_stock import sync_low_stock
+from .models import DailyMovementRollup, DemandForecast, InventoryItem
+
+QUERY_CHUNK_SIZE = 900
+
+
+def load_outflow_matrix(days, end=None):
+    """Saídas diárias dos itens existentes nos ``days`` dias até ``end``
+    (inclusive), lidas do rollup diário. Devolve ``(item_ids, quantidades,
+    matriz)``: uma linha por item, uma coluna por dia, do mais antigo ao mais
+    recente. Itens sem saídas no período não entram."""
+    end = end or timezone.localdate()
+    start = end - datetime.timedelta(days=days - 1)
+
+    refs, offsets, outflows = [], [], []
+    rows = (DailyMovementRollup.objects
+            .filter(day__gte=start, day__lte=end, outflow__gt=0)
+            .values_list('item_ref', 'day', 'outflow')
+            .iterator(chunk_size=10000))
+    for item_ref, day, outflow in rows:
+        refs.append(item_ref)
+        offsets.append((day - start).days)
+        outflows.append(outflow)
+
+    quantities = dict(InventoryItem.objects.values_list('id', 'quantity'))
+    refs = np.asarray(refs, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    outflows = np.asarray(outflows, dtype=np.float32)
+    existing = np.fromiter((ref in quantities for ref in refs.tolist()), dtype=bool, count=len(refs))
+    refs, offsets, outflows = refs[existing], offsets[existing], outflows[existing]
+
+    item_ids, rows_index = np.unique(refs, return_inverse=True)
+    matrix = np.zeros((len(item_ids), days), dtype=np.float32)
+    matrix[rows_index, offsets] = outflows
+    stock = np.fromiter((quantities[item_id] for item_id in item_ids.tolist()), dtype=np.float32,
+                        count=len(item_ids))
+    return item_ids, stock, matrix
+
+
+def forecast(matrix, stock, method='ewma', alpha=0.1, window=28, lead_time=7, z=1.65):
+    """Calcula, para todas as linhas de uma vez, a demanda diária prevista,
+    o desvio, os dias de cobertura e o ponto de pedido."""
+    days = matrix.shape[1]
+    if method == 'sma':
+        demand = matrix[:, -window:].mean(axis=1)
+    else:
+        # Suavização exponencial como um produto com os pesos de cada dia:
+        # o nível final é sum(alpha * (1 - alpha)^idade * x), com o primeiro
+        # dia (que inicia a série) pesando (1 - alpha)^idade
+        weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+        weights[0] += (1 - alpha) ** days
+        demand = matrix @ weights.astype(np.float32)
+    std = matrix[:, -window:].std(axis=1)
+
+    reorder_point = np.ceil(demand * lead_time + z * std * np.sqrt(lead_time)).astype(np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(demand > 0, stock / demand, np.nan)
+    return demand, std, days_of_cover, reorder_point
+
+
+def _save(item_ids, demand, std, days_of_cover, reorder_point, computed_at):
+    forecasts = [
+        DemandForecast(item_id=item_id, daily_demand=d, demand_std=s,
+                       days_of_cover=None if np.isnan(c) else c, reorder_point=r, computed_at=computed_at)
+        for item_id, d, s, c, r in zip(item_ids.tolist(), demand.tolist(), std.tolist(),
+                                       days_of_cover.tolist(), reorder_point.tolist())
+    ]
+    DemandForecast.objects.bulk_create(
+        forecasts, batch_size=500, update_conflicts=True, unique_fields=['item'],
+        update_fields=['daily_demand', 'demand_std', 'days_of_cover', 'reorder_point', 'computed_at'],
+    )
+    stale = list(DemandForecast.objects.exclude(computed_at=computed_at).values_list('item_id', flat=True))
+    DemandForecast.objects.exclude(computed_at=computed_at).delete()
+
+    table = InventoryItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {table} SET forecast_reorder_point = %s WHERE id = %s',
+            list(zip(reorder_point.tolist(), item_ids.tolist()))
+        )
+        for start in range(0, len(stale), QUERY_CHUNK_SIZE):
+            chunk = stale[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'UPDATE {table} SET forecast_reorder_point = NULL WHERE id IN ({placeholders})', chunk)
+    return stale
+
+
+def run_forecast(days=None, end=None, method=None, alpha=None, window=None, lead_time=None, z=None):
+    """Carrega o histórico, prevê a demanda de todos os itens e grava o
+    resultado em DemandForecast e no ponto de pedido dos itens (que passa a
+    valer para a marca de baixo estoque). Devolve os tempos de cada etapa."""
+    timings = {}
+    started = time.perf_counter()
+    item_ids, stock, matrix = load_outflow_matrix(days or settings.FORECAST_HISTORY_DAYS, end)
+    timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = forecast(
+        matrix, stock,
+        method=method or settings.FORECAST_METHOD,
+        alpha=alpha or settings.FORECAST_ALPHA,
+        window=window or settings.FORECAST_WINDOW_DAYS,
+        lead_time=lead_time or settings.FORECAST_LEAD_TIME_DAYS,
+        z=settings.FORECAST_SERVICE_Z if z is None else z,
+    )
+    timings['compute'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        stale = _save(item_ids, *results, computed_at=timezone.now())
+        sync_low_stock(item_ids.tolist() + stale)
+        # A contagem de baixo estoque em cache pode ter mudado para qualquer usuário
+        transaction.on_commit(bump_category_version)
+    timings['save'] = time.perf_counter() - started
+
+    timings['items'] = len(item_ids)
+    return timings
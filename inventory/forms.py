@@ -14,7 +14,7 @@ class InventoryItemForm(forms.ModelForm):
     category = forms.ModelChoiceField(queryset=Category.objects.all(), initial=0)
     class Meta:
         model = InventoryItem
-        fields = ['name', 'quantity', 'category']
+        fields = ['name', 'quantity', 'category', 'reorder_level']
         
 class ItemFilterForm(forms.Form):
     name = forms.CharField(
@@ -0,0 +1,134 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import csv
+import json
+import time
+
+from django.db import connection, transaction
+
+from .audit import log_movements
+from .inventory_cache import bump_inventory_version
+from .low_stock import sync_low_stock
+from .search import index_items
+from .models import Category, InventoryItem, MovementLog
+
+# Máximo de mensagens de erro guardadas no resumo da importação
+MAX_REPORTED_ERRORS = 50
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_records(stream, fmt):
+    """Lê registros ``{name, quantity, category}`` de um arquivo texto,
+    uma linha por vez."""
+    if fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+    else:
+        yield from csv.DictReader(stream)
+
+
+class CategoryCache:
+    """Resolve nomes de categoria para IDs, criando as que faltam em lote."""
+
+    def __init__(self):
+        self._ids = {}
+
+    def resolve(self, names):
+        missing = {name for name in names if name and name not in self._ids}
+        if missing:
+            for category_id, name in Category.objects.filter(name__in=missing).values_list('id', 'name'):
+                self._ids.setdefault(name, category_id)
+            new = [Category(name=name) for name in missing if name not in self._ids]
+            created = Category.objects.bulk_create(new)
+            if created and created[0].pk is None:
+                # Banco sem RETURNING no INSERT em lote: busca os IDs pelo nome
+                created = Category.objects.filter(name__in=[c.name for c in new])
+            for category in created:
+                self._ids.setdefault(category.name, category.pk)
+        return self._ids
+
+
+def _parse(record):
+    if not isinstance(record, dict):
+        raise ValueError('registro inválido')
+    name = (record.get('name') or '').strip()
+    if not name:
+        raise ValueError('nome vazio')
+    try:
+        quantity = int(record.get('quantity'))
+    except (TypeError, ValueError):
+        raise ValueError(f"quantidade inválida: {record.get('quantity')!r}")
+    category = (record.get('category') or '').strip() or None
+    return name.upper(), quantity, category
+
+
+def _insert_chunk(rows, user, categories):
+    category_ids = categories.resolve(category for _, _, category in rows)
+    items = [
+        InventoryItem(name=name, quantity=quantity, category_id=category_ids.get(category), user=user)
+        for name, quantity, category in rows
+    ]
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            InventoryItem.objects.bulk_create(items)
+        else:
+            for item in items:
+                item.save()
+        log_movements([
+            MovementLog(item=item, change=item.quantity, action_type='ADD', user=user)
+            for item in items
+        ])
+        # bulk_create não dispara post_save
+        sync_low_stock(item.pk for item in items)
+        index_items(item.pk for item in items)
+        transaction.on_commit(lambda: bump_inventory_version(user.pk if user else None))
+    return items
+
+
+def import_items(records, user=None, chunk_size=1000, progress=None):
+    """Importa itens em blocos de ``chunk_size`` com ``bulk_create``, criando
+    também o log 'ADD' de cada item. A memória usada depende apenas do tamanho
+    do bloco. ``progress(stats)`` é chamado ao fim de cada bloco."""
+    categories = CategoryCache()
+    stats = {'processed': 0, 'created': 0, 'failed': 0, 'errors': [], 'elapsed': 0.0, 'rate': 0.0}
+    started = time.perf_counter()
+    rows = []
+
+    def flush():
+        stats['created'] += len(_insert_chunk(rows, user, categories))
+        rows.clear()
+        stats['elapsed'] = time.perf_counter() - started
+        stats['rate'] = stats['created'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        if progress:
+            progress(stats)
+
+    for number, record in enumerate(records, start=1):
+        stats['processed'] += 1
+        try:
+            rows.append(_parse(record))
+        except ValueError as exc:
+            stats['failed'] += 1
+            if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                stats['errors'].append(f'Registro {number}: {exc}')
+            continue
+        if len(rows) >= chunk_size:
+            flush()
+
+    if rows:
+        flush()
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
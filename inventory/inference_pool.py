@@ -0,0 +1,132 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .perf import merge_metrics, run_timed
+
+
+class PoolBusy(Exception):
+    """A fila de inferências pendentes está cheia."""
+
+
+# Tarefas executadas nos processos do pool. Os imports de utils ficam dentro
+# das funções porque o módulo também é importado pelo processo web.
+
+# Verdadeiro apenas dentro dos processos do pool
+_in_worker = False
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+    import django
+    django.setup()
+    from .utils import warm_up
+    warm_up(background=False)
+
+def _run_in_worker(task, *args):
+    # Devolve, junto com o resultado, as estatísticas do chatbot deste
+    # processo (caches, tempos de carga), que só existem no worker
+    from .utils import chatbot_stats
+    result, metrics = run_timed(task, *args)
+    return result, metrics, os.getpid(), chatbot_stats()
+
+def get_response_task(message):
+    from .utils import get_response
+    return get_response(message)
+
+def chat_task(message):
+    from .utils import get_response, predict_class
+    # Um worker do pool atende uma mensagem por vez e não há o que agrupar;
+    # nas threads do processo web (pool_size=0) as mensagens concorrentes
+    # passam pelo micro-batcher, conforme CHATBOT_MICROBATCH_ENABLED
+    batched = False if _in_worker else None
+    return predict_class(message, batched=batched), get_response(message)
+
+def predict_classes_task(messages):
+    from .utils import predict_classes
+    return predict_classes(messages)
+
+
+class InferencePool:
+    """Executa a inferência do chatbot fora da thread da requisição.
+
+    Com ``CHATBOT_INFERENCE_POOL_SIZE`` > 0 usa um pool de processos com os
+    modelos pré-carregados; com 0 roda em uma thread do próprio processo.
+    No máximo ``CHATBOT_INFERENCE_MAX_PENDING`` tarefas ficam pendentes; além
+    disso ``run`` levanta ``PoolBusy``.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._worker_stats = {}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.CHATBOT_INFERENCE_POOL_SIZE,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    async def run(self, task, *args):
+        with self._lock:
+            if self._pending >= settings.CHATBOT_INFERENCE_MAX_PENDING:
+                raise PoolBusy()
+            self._pending += 1
+        try:
+            # run_timed devolve também os tempos de inferência medidos no
+            # processo (ou thread) que executou a tarefa
+            if settings.CHATBOT_INFERENCE_POOL_SIZE > 0:
+                loop = asyncio.get_running_loop()
+                result, metrics, pid, worker_stats = await loop.run_in_executor(
+                    self._get_executor(), _run_in_worker, task, *args)
+                with self._lock:
+                    self._worker_stats[pid] = worker_stats
+            else:
+                result, metrics = await sync_to_async(run_timed, thread_sensitive=False)(task, *args)
+            merge_metrics(metrics)
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def reset(self):
+        # Encerra os processos atuais; os próximos carregam modelos atualizados
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._worker_stats = {}
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=False)
+
+    def worker_stats(self):
+        """Estatísticas do chatbot por PID de worker, como estavam ao fim da
+        última tarefa de cada um."""
+        with self._lock:
+            return dict(self._worker_stats)
+
+    def stats(self):
+        return {
+            'pool_size': settings.CHATBOT_INFERENCE_POOL_SIZE,
+            'max_pending': settings.CHATBOT_INFERENCE_MAX_PENDING,
+            'pending': self._pending,
+        }
+
+
+inference_pool = InferencePool()
@@ -0,0 +1,75 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+# Contagens ficam em cache até o inventário do usuário mudar. A versão do
+# usuário entra na chave; mudar o inventário incrementa a versão e torna as
+# chaves antigas inalcançáveis (elas expiram sozinhas pelo timeout).
+GLOBAL_VERSION_KEY = 'inventory:version:categories'
+
+
+def _version_key(user_id):
+    return f'inventory:version:user:{user_id}'
+
+
+def inventory_version(user_id):
+    keys = [_version_key(user_id), GLOBAL_VERSION_KEY]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, 1, timeout=None)
+            versions[key] = cache.get(key, 1)
+    return f'{versions[keys[0]]}.{versions[keys[1]]}'
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+def bump_inventory_version(*user_ids):
+    for user_id in set(user_ids):
+        if user_id is not None:
+            _bump(_version_key(user_id))
+
+
+def bump_category_version():
+    # Nomes de categoria entram na busca do dashboard de todos os usuários
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def count_cache_key(user_id, name, *parts):
+    digest = hashlib.md5('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return f'inventory:count:{user_id}:{inventory_version(user_id)}:{name}:{digest}'
+
+
+def cached_value(key, compute):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.INVENTORY_COUNT_CACHE_TIMEOUT)
+    return value
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator que reaproveita o COUNT(*) guardado em ``cache_key``."""
+
+    def __init__(self, object_list, per_page, cache_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+
+    @cached_property
+    def count(self):
+        return cached_value(self.cache_key, lambda: Paginator.count.func(self))
@@ -0,0 +1,97 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import os
+import threading
+from collections import deque
+
+
+class KeywordMatcher:
+    """Autômato de Aho–Corasick sobre as palavras-chave do chatbot.
+
+    Percorre o texto uma única vez e devolve o índice da primeira entrada
+    (na ordem do arquivo) que tenha alguma palavra-chave contida no texto,
+    o mesmo resultado da busca sequencial com ``keyword in text``.
+    """
+
+    def __init__(self, keyword_groups):
+        # Estado 0 é a raiz; out guarda o menor índice de entrada reconhecido
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]
+
+        for index, keywords in enumerate(keyword_groups):
+            for keyword in keywords:
+                state = 0
+                for char in keyword:
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][char] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append(None)
+                    state = next_state
+                self._out[state] = _min_index(self._out[state], index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] = _min_index(self._out[next_state], self._out[fail])
+                queue.append(next_state)
+
+    def match(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        best = out[0]
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found = out[state]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return best
+
+
+def _min_index(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+class KeywordTable:
+    """Mantém as entradas de palavras-chave e o autômato compilado em memória,
+    recompilando apenas quando o mtime do arquivo muda."""
+
+    def __init__(self, path, loader):
+        self.path = path
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._compiled = None
+
+    def get(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    entries = self._loader(self.path)
+                    matcher = KeywordMatcher(entry['keywords'] for entry in entries)
+                    self._compiled = (entries, matcher)
+                    self._mtime = mtime
+        return self._compiled
@@ -0,0 +1,105 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, Count, F, Q, Value, When
+from django.db.models.functions import Coalesce
+
+from .inventory_cache import bump_category_version
+from .models import InventoryItem, StockSummary
+
+QUERY_CHUNK_SIZE = 900
+
+
+# Limite de cada item: reorder_level, o ponto de pedido previsto ou o global
+# settings.LOW_QUANTITY, nessa ordem
+def threshold():
+    return Coalesce(F('reorder_level'), F('forecast_reorder_point'), Value(settings.LOW_QUANTITY))
+
+
+def is_low(quantity, reorder_level, forecast_reorder_point=None):
+    for limit in (reorder_level, forecast_reorder_point, settings.LOW_QUANTITY):
+        if limit is not None:
+            return quantity <= limit
+
+
+def _add_to_counter(user_id, delta):
+    if not StockSummary.objects.filter(user_id=user_id).update(low_stock_count=F('low_stock_count') + delta):
+        try:
+            with transaction.atomic():
+                StockSummary.objects.create(user_id=user_id, low_stock_count=delta)
+        except IntegrityError:
+            # Outro processo criou o contador ao mesmo tempo
+            StockSummary.objects.filter(user_id=user_id).update(low_stock_count=F('low_stock_count') + delta)
+
+
+def sync_low_stock(item_ids):
+    """Recalcula a marca de baixo estoque dos itens e ajusta os contadores
+    dos donos. Cada marca é trocada com um UPDATE condicional, então duas
+    sincronizações simultâneas não contam o mesmo item duas vezes."""
+    item_ids = list(item_ids)
+    with transaction.atomic():
+        groups = defaultdict(list)
+        for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+            rows = (InventoryItem.objects
+                    .filter(pk__in=item_ids[start:start + QUERY_CHUNK_SIZE])
+                    .values_list('id', 'user_id', 'quantity', 'reorder_level', 'forecast_reorder_point', 'low_stock'))
+            for item_id, user_id, quantity, reorder_level, forecast_reorder_point, low_stock in rows:
+                low = is_low(quantity, reorder_level, forecast_reorder_point)
+                if low != low_stock:
+                    groups[(user_id, low)].append(item_id)
+
+        deltas = defaultdict(int)
+        for (user_id, low), ids in groups.items():
+            changed = InventoryItem.objects.filter(pk__in=ids, low_stock=not low).update(low_stock=low)
+            deltas[user_id] += changed if low else -changed
+
+        for user_id, delta in deltas.items():
+            if user_id is not None and delta:
+                _add_to_counter(user_id, delta)
+
+
+def transfer_flag(old_user_id, old_low, new_user_id, new_low):
+    """Ajusta os contadores quando um save() grava a marca e o dono do item
+    diretamente (a marca gravada pode vir de uma instância desatualizada)."""
+    if old_low and old_user_id is not None:
+        _add_to_counter(old_user_id, -1)
+    if new_low and new_user_id is not None:
+        _add_to_counter(new_user_id, 1)
+
+
+def item_removed(user_id, was_low):
+    transfer_flag(user_id, was_low, None, False)
+
+
+def low_stock_count(user_id):
+    return StockSummary.objects.filter(user_id=user_id).values_list('low_stock_count', flat=True).first() or 0
+
+
+def rebuild_low_stock():
+    """Reconstrói todas as marcas e contadores a partir das quantidades."""
+    with transaction.atomic():
+        InventoryItem.objects.update(low_stock=Case(
+            When(quantity__lte=threshold(), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ))
+        StockSummary.objects.all().delete()
+        counts = (InventoryItem.objects
+                  .filter(user__isnull=False)
+                  .values('user_id')
+                  .annotate(total=Count('id', filter=Q(low_stock=True))))
+        StockSummary.objects.bulk_create(
+            [StockSummary(user_id=row['user_id'], low_stock_count=row['total']) for row in counts],
+            batch_size=500,
+        )
+        # Invalida as contagens em cache de todos os usuários
+        transaction.on_commit(bump_category_version)
+    return StockSummary.objects.count()
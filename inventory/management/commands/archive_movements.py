@@ -0,0 +1,36 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.archiving import archive_movements
+from inventory.filters import parse_moment
+
+
+class Command(BaseCommand):
+    help = 'Move as movimentações antigas para arquivos gzip JSONL mensais e grava o saldo no corte'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Corte (AAAA-MM-DD ou data/hora ISO)')
+        parser.add_argument('--days', type=int, default=settings.MOVEMENT_ARCHIVE_AFTER_DAYS,
+                            help='Sem --before, arquiva as movimentações com mais de N dias')
+        parser.add_argument('--chunk-size', type=int, default=settings.MOVEMENT_ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = parse_moment(options['before'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        else:
+            cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+
+        archived = archive_movements(
+            cutoff,
+            chunk_size=options['chunk_size'],
+            progress=lambda total: self.stdout.write(f'{total} movimentações arquivadas'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{archived} movimentações anteriores a {cutoff.isoformat()} em {settings.MOVEMENT_ARCHIVE_DIR}'
+        ))
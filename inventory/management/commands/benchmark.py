@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from inventory.benchmarks import BENCHMARK_USERNAME, build_cases, compare, run_benchmarks, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ('Gera dados em um banco de teste, mede as views e o chatbot e compara '
+            'p95 e consultas SQL com o baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100_000)
+        parser.add_argument('--movements', type=int, default=5_000_000)
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--case', action='append', dest='cases',
+                            help='Mede apenas este caso (pode ser repetido)')
+        parser.add_argument('--baseline', default=str(settings.BENCHMARK_BASELINE))
+        parser.add_argument('--threshold', type=float, default=settings.BENCHMARK_REGRESSION_THRESHOLD)
+        parser.add_argument('--save', action='store_true', help='Grava os resultados como novo baseline')
+        parser.add_argument('--db-file',
+                            help='Arquivo do banco de teste; reaproveitado (sem gerar os dados de novo) '
+                                 'se já existir')
+
+    def progress(self, stage, done):
+        self.stdout.write(f'  {stage}: {done}', ending='\r')
+
+    def handle(self, *args, **options):
+        keepdb = bool(options['db_file'])
+        if keepdb:
+            connection.settings_dict['TEST']['NAME'] = options['db_file']
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb, serialize=False)
+        try:
+            if options['cases']:
+                unknown = set(options['cases']) - set(build_cases())
+                if unknown:
+                    raise CommandError(f"Casos desconhecidos: {', '.join(sorted(unknown))}")
+            if not User.objects.filter(username=BENCHMARK_USERNAME).exists():
+                self.stdout.write('Gerando dados...')
+                stats = seed_dataset(options['items'], options['movements'], options['users'],
+                                     seed=options['seed'], progress=self.progress)
+                self.stdout.write(f"Dados gerados em {stats['elapsed']:.1f}s")
+            results = run_benchmarks(options['iterations'], options['cases'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"{name:20} erro ({result['error']})"))
+            elif 'skipped' in result:
+                self.stdout.write(f"{name:20} ignorado ({result['skipped']})")
+            else:
+                self.stdout.write(f"{name:20} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+                                  f"{result['queries']:3} consultas")
+
+        meta = {key: options[key] for key in ('items', 'movements', 'users', 'seed', 'iterations')}
+        path = Path(options['baseline'])
+        if options['save']:
+            path.write_text(json.dumps({'meta': meta, 'results': results}, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Baseline gravado em {path}'))
+            return
+        if not path.exists():
+            self.stdout.write(self.style.WARNING(f'Sem baseline em {path}; use --save para gravar um'))
+            return
+
+        baseline = json.loads(path.read_text(encoding='utf-8'))
+        if baseline.get('meta') != meta:
+            self.stdout.write(self.style.WARNING(f"Baseline gerado com outros parâmetros: {baseline.get('meta')}"))
+        regressions = compare(results, baseline['results'], options['threshold'])
+        if regressions:
+            raise CommandError('Regressões em relação ao baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Sem regressões em relação ao baseline'))
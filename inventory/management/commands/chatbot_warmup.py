@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inventory.model_registry import registry
+from inventory.utils import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Carrega todos os modelos do chatbot e mostra o tempo de carga de cada um'
+
+    def handle(self, *args, **options):
+        warm_up(background=False)
+
+        load_times = registry.load_times()
+        for name, seconds in load_times.items():
+            self.stdout.write(f'{name}: {seconds:.3f}s')
+        self.stdout.write(self.style.SUCCESS(f'Total: {sum(load_times.values()):.3f}s'))
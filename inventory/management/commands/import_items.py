@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importing import detect_format, import_items, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Importa itens de um arquivo CSV ou JSONL (colunas name, quantity, category)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', help='Usuário dono dos itens importados')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Padrão: deduzido pela extensão')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário '{options['user']}' não encontrado")
+
+        fmt = options['format'] or detect_format(options['path'])
+
+        def progress(stats):
+            self.stdout.write(
+                f"{stats['processed']} lidos, {stats['created']} criados, {stats['failed']} com erro "
+                f"({stats['rate']:.0f} itens/s)"
+            )
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            stats = import_items(iter_records(stream, fmt), user=user,
+                                 chunk_size=options['chunk_size'], progress=progress)
+
+        for error in stats['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} itens importados em {stats['elapsed']:.2f}s"
+        ))
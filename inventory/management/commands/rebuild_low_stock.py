@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.low_stock import rebuild_low_stock
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as marcas e os contadores de baixo estoque a partir das quantidades'
+
+    def handle(self, *args, **options):
+        users = rebuild_low_stock()
+        self.stdout.write(self.style.SUCCESS(f'Contadores de baixo estoque reconstruídos para {users} usuários'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.filters import parse_day
+from inventory.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = ('Recalcula o rollup diário de movimentações a partir do MovementLog '
+            '(depois de um arquivamento, use --since posterior ao corte)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Recalcula apenas a partir desta data (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_day(options['since'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        created = rebuild_rollup(since)
+        self.stdout.write(self.style.SUCCESS(f'{created} linhas de rollup gravadas'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recria o índice de busca (FTS5) dos itens a partir do banco'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write('Banco sem FTS5: a busca usa icontains e não precisa de índice')
+            return
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'{total} itens indexados'))
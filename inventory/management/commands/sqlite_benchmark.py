@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory.sqlite_benchmark import run_benchmark
+from inventory.sqlite_tuning import pragmas
+
+
+def tuned_config():
+    database = settings.DATABASES['default']
+    begin = 'BEGIN IMMEDIATE' if database.get('OPTIONS', {}).get('transaction_mode') == 'IMMEDIATE' else 'BEGIN'
+    return pragmas(), database.get('CONN_MAX_AGE', 0) != 0, begin
+
+
+class Command(BaseCommand):
+    help = 'Compara leitura/escrita concorrente no SQLite com a configuração padrão e a ajustada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['default', 'tuned', 'both'], default='both')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2, help='Quantos dos processos escrevem')
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--items', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--dir', help='Diretório do banco temporário (padrão: o do sistema)')
+
+    def handle(self, *args, **options):
+        configs = {
+            'default': ([], False, 'BEGIN'),
+            'tuned': tuned_config(),
+        }
+        modes = ['default', 'tuned'] if options['mode'] == 'both' else [options['mode']]
+        results = {}
+        for mode in modes:
+            statements, persistent, begin = configs[mode]
+            results[mode] = run_benchmark(
+                statements, persistent, begin,
+                processes=options['processes'],
+                writers=options['writers'],
+                seconds=options['seconds'],
+                items=options['items'],
+                seed=options['seed'],
+                directory=options['dir'],
+            )
+            for kind, stats in results[mode].items():
+                self.stdout.write(
+                    f"{mode:8} {kind:6} {stats['ops_per_second']:10.1f} ops/s  erros {stats['errors']:5}  "
+                    f"p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms"
+                )
+
+        if len(results) == 2:
+            for kind in ('read', 'write'):
+                before = results['default'][kind]['ops_per_second']
+                after = results['tuned'][kind]['ops_per_second']
+                ratio = after / before if before else float('inf')
+                self.stdout.write(self.style.SUCCESS(f'{kind}: {ratio:.1f}x com a configuração ajustada'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stock_history import take_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Grava a quantidade atual de todos os itens como checkpoint para as consultas de estoque por data'
+
+    def handle(self, *args, **options):
+        taken_at, created = take_checkpoint()
+        self.stdout.write(self.style.SUCCESS(f'Checkpoint de {taken_at.isoformat()}: {created} itens'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_alter_inventoryitem_user_alter_movementlog_item'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'id'], name='item_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'quantity'], name='item_user_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='log_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['timestamp', 'id'], name='log_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['item', 'timestamp'], name='log_item_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(condition=models.Q(('change__lt', 0)), fields=['item'], name='log_outflow_item_idx'),
+        ),
+    ]
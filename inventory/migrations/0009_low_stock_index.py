@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_low_stock(apps, schema_editor):
+    # Marca os itens existentes e cria os contadores de cada usuário
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    StockSummary = apps.get_model('inventory', 'StockSummary')
+    InventoryItem.objects.filter(quantity__lte=settings.LOW_QUANTITY).update(low_stock=True)
+    counts = (InventoryItem.objects
+              .filter(user__isnull=False)
+              .values('user_id')
+              .annotate(total=models.Count('id', filter=models.Q(low_stock=True))))
+    StockSummary.objects.bulk_create(
+        [StockSummary(user_id=row['user_id'], low_stock_count=row['total']) for row in counts]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('inventory', '0008_movement_and_item_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('low_stock_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='reorder_level',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'low_stock'], name='item_user_low_stock_idx'),
+        ),
+        migrations.RunPython(build_low_stock, migrations.RunPython.noop),
+    ]
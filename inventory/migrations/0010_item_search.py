@@ -0,0 +1,37 @@
+from django.db import migrations
+from unidecode import unidecode
+
+
+def create_search_table(apps, schema_editor):
+    # Índice FTS5 de inventory.search; outros bancos usam a busca por icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE inventory_item_search USING fts5('
+        "name, category, owner, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    rows = InventoryItem.objects.values_list('id', 'name', 'category__name', 'user_id').iterator()
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO inventory_item_search (rowid, name, category, owner) VALUES (%s, %s, %s, %s)',
+            [(item_id, unidecode(name or '').lower(), unidecode(category or '').lower(),
+              f'u{user_id}' if user_id is not None else '')
+             for item_id, name, category, user_id in rows]
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS inventory_item_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_low_stock_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
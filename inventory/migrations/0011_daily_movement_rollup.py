@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:56
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    # Mesmo cálculo de inventory.rollup.rebuild_rollup, com os modelos
+    # históricos. Nesta migração o log ainda não tem item_ref (0013): os logs
+    # de itens já excluídos perderam o id e não há a que item atribuí-los
+    MovementLog = apps.get_model('inventory', 'MovementLog')
+    DailyMovementRollup = apps.get_model('inventory', 'DailyMovementRollup')
+    rows = (MovementLog.objects
+            .filter(item__isnull=False)
+            .annotate(day=TruncDate('timestamp'))
+            .values('item_id', 'day')
+            .annotate(inflow=models.Sum('change', filter=models.Q(change__gt=0)),
+                      outflow=models.Sum('change', filter=models.Q(change__lt=0)),
+                      movements=models.Count('id'),
+                      item_name=models.Max('item__name'))
+            .order_by())
+    DailyMovementRollup.objects.bulk_create([
+        DailyMovementRollup(item_ref=row['item_id'], item_name=row['item_name'] or '', day=row['day'],
+                            inflow=row['inflow'] or 0, outflow=-(row['outflow'] or 0),
+                            movements=row['movements'])
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_item_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_ref', models.BigIntegerField()),
+                ('item_name', models.CharField(blank=True, default='', max_length=200)),
+                ('day', models.DateField()),
+                ('inflow', models.PositiveIntegerField(default=0)),
+                ('outflow', models.PositiveIntegerField(default=0)),
+                ('movements', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'item_ref', 'outflow', 'inflow'], name='rollup_day_item_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item_ref', 'day'), name='rollup_item_day_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_daily_movement_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_ref', models.BigIntegerField()),
+                ('item_name', models.CharField(blank=True, default='', max_length=200)),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item_ref', 'taken_at'), name='snapshot_item_taken_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_item_ref(apps, schema_editor):
+    # Logs de itens já excluídos perderam o id e ficam sem item_ref
+    MovementLog = apps.get_model('inventory', 'MovementLog')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    MovementLog.objects.filter(item__isnull=False).update(item_ref=models.F('item_id'))
+    # Até aqui os snapshots só eram gravados pelo arquivamento
+    StockSnapshot.objects.update(archived=True)
+
+
+def open_checkpoint(apps, schema_editor):
+    # Checkpoint de abertura com a quantidade atual de cada item: o começo do
+    # histórico pode ter sido apagado (antigo "Limpar Logs"), então o replay
+    # não pode partir de zero. Movimentações com data futura são descontadas
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    MovementLog = apps.get_model('inventory', 'MovementLog')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    taken_at = timezone.now()
+    later = dict(MovementLog.objects
+                 .filter(timestamp__gt=taken_at, item_ref__isnull=False)
+                 .values('item_ref')
+                 .annotate(total=models.Sum('change'))
+                 .values_list('item_ref', 'total')
+                 .order_by())
+    batch = []
+    for item_id, name, quantity in InventoryItem.objects.values_list('id', 'name', 'quantity').iterator(chunk_size=2000):
+        batch.append(StockSnapshot(item_ref=item_id, item_name=name, taken_at=taken_at,
+                                   quantity=quantity - later.get(item_id, 0)))
+        if len(batch) >= 2000:
+            StockSnapshot.objects.bulk_create(batch, batch_size=500)
+            batch = []
+    StockSnapshot.objects.bulk_create(batch, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_stock_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movementlog',
+            name='log_item_timestamp_idx',
+        ),
+        migrations.AddField(
+            model_name='movementlog',
+            name='item_ref',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_item_ref, migrations.RunPython.noop),
+        migrations.RunPython(open_checkpoint, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['item_ref', 'timestamp'], name='log_item_ref_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['taken_at', 'item_ref'], name='snapshot_taken_item_idx'),
+        ),
+    ]
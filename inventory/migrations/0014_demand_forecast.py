@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_movement_item_ref_and_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='inventory.inventoryitem')),
+                ('daily_demand', models.FloatField()),
+                ('demand_std', models.FloatField()),
+                ('days_of_cover', models.FloatField(blank=True, null=True)),
+                ('reorder_point', models.IntegerField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='forecast_reorder_point',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
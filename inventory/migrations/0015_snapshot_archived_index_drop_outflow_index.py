@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_demand_forecast'),
+    ]
+
+    operations = [
+        # O relatório de mais vendidos lê o DailyMovementRollup (0011); nenhuma
+        # consulta usa mais este índice
+        migrations.RemoveIndex(
+            model_name='movementlog',
+            name='log_outflow_item_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(condition=models.Q(('archived', True)), fields=['taken_at'], name='snapshot_archived_idx'),
+        ),
+    ]
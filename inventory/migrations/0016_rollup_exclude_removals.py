@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+from django.db import migrations, models
+from django.db.models.functions import Greatest, TruncDate
+
+
+def exclude_removals(apps, schema_editor):
+    # Até aqui a exclusão de um item (REMOVE) entrava como saída no rollup.
+    # Desconta as exclusões que ainda estão no log; as já arquivadas não têm
+    # mais como ser separadas
+    MovementLog = apps.get_model('inventory', 'MovementLog')
+    DailyMovementRollup = apps.get_model('inventory', 'DailyMovementRollup')
+    rows = (MovementLog.objects
+            .filter(action_type='REMOVE', change__lt=0, item_ref__isnull=False)
+            .annotate(day=TruncDate('timestamp'))
+            .values('item_ref', 'day')
+            .annotate(total=models.Sum('change'))
+            .order_by())
+    for row in rows.iterator():
+        (DailyMovementRollup.objects
+         .filter(item_ref=row['item_ref'], day=row['day'])
+         .update(outflow=Greatest(models.F('outflow') + row['total'], 0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_snapshot_archived_index_drop_outflow_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(exclude_removals, migrations.RunPython.noop),
+    ]
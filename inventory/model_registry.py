@@ -0,0 +1,82 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Carrega os modelos do chatbot sob demanda, uma única vez por processo.
+
+    Cada modelo é registrado com uma função de carga; a carga acontece no
+    primeiro ``get`` (ou em ``warm_up``) e o tempo gasto fica disponível em
+    ``load_times``.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._load_times = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        try:
+            return self._models[name]
+        except KeyError:
+            pass
+
+        with self._locks[name]:
+            # Outra thread pode ter carregado enquanto esperávamos
+            if name not in self._models:
+                start = time.perf_counter()
+                model = self._loaders[name]()
+                elapsed = time.perf_counter() - start
+                self._load_times[name] = elapsed
+                self._models[name] = model
+                logger.info('Modelo %s carregado em %.3fs', name, elapsed)
+            return self._models[name]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def unload(self, name):
+        with self._locks[name]:
+            self._models.pop(name, None)
+            self._load_times.pop(name, None)
+
+    def load_times(self):
+        return dict(self._load_times)
+
+    def warm_up(self, names=None, background=False):
+        names = list(names or self._loaders)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    logger.exception('Falha ao carregar o modelo %s', name)
+
+        if not background:
+            load_all()
+            return None
+
+        thread = threading.Thread(target=load_all, name='chatbot-warmup', daemon=True)
+        thread.start()
+        return thread
+
+
+registry = ModelRegistry()
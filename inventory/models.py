@@ -15,11 +15,34 @@ class InventoryItem(models.Model):
     category = models.ForeignKey('Category', on_delete=models.SET_NULL, blank = True, null = True)
     date_created = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null = True)
+    # Limite de baixo estoque do item; vazio usa o ponto de pedido previsto
+    # (inventory.forecasting) ou, sem previsão, settings.LOW_QUANTITY
+    reorder_level = models.IntegerField(blank=True, null=True)
+    forecast_reorder_point = models.IntegerField(blank=True, null=True, editable=False)
+    # Mantido por inventory.low_stock a cada mudança de quantidade
+    low_stock = models.BooleanField(default=False, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Listagem do dashboard (itens do usuário por id) e filtro de baixo estoque
+            models.Index(fields=['user', 'id'], name='item_user_id_idx'),
+            models.Index(fields=['user', 'quantity'], name='item_user_quantity_idx'),
+            models.Index(fields=['user', 'low_stock'], name='item_user_low_stock_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
 
+class StockSummary(models.Model):
+    """Contadores desnormalizados por usuário, lidos em O(1) pelo dashboard."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    low_stock_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user}: {self.low_stock_count} itens com baixo estoque'
+
+
 class Category(models.Model):
     name = models.CharField(max_length=200)
     
@@ -29,6 +52,16 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
+class MovementLogQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create não chama save(): preenche item_ref aqui
+        objs = list(objs)
+        for log in objs:
+            if log.item_ref is None:
+                log.item_ref = log.item_id
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class MovementLog(models.Model):
     ACTION_CHOICES = [
         ('ADD', 'Adicionado'),
@@ -39,12 +72,95 @@ class MovementLog(models.Model):
     ]
 
     item = models.ForeignKey('InventoryItem', on_delete=models.SET_NULL, null=True)
+    # Id do item, mantido depois que o item é excluído (item vira NULL)
+    item_ref = models.BigIntegerField(null=True, blank=True, editable=False)
     change = models.IntegerField()  
     action_type = models.CharField(max_length=10, choices=ACTION_CHOICES, default='ADD')  
     timestamp = models.DateTimeField(default=timezone.now)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)  
     observation = models.TextField(blank=True, null=True)  
 
+    objects = MovementLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Log de movimentações (paginação por timestamp, id) e exportação
+            models.Index(fields=['user', '-timestamp', '-id'], name='log_user_timestamp_idx'),
+            models.Index(fields=['timestamp', 'id'], name='log_timestamp_id_idx'),
+            # Filtro por item e estoque em uma data (replay depois do checkpoint)
+            models.Index(fields=['item_ref', 'timestamp'], name='log_item_ref_timestamp_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.item_ref is None:
+            self.item_ref = self.item_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         item_name = self.item.name
         return f"{item_name} - {self.get_action_type_display()} - Observação: {self.observation} - {self.change} units on {self.timestamp} by {self.user}"
+
+
+class DailyMovementRollup(models.Model):
+    """Entradas e saídas de cada item por dia, mantidas a cada movimentação
+    (inventory.rollup). Exclusões de itens (REMOVE) contam apenas em
+    ``movements``. ``item_ref`` guarda o id mesmo depois que o item é
+    excluído; ``item_name`` é o último nome conhecido."""
+    item_ref = models.BigIntegerField()
+    item_name = models.CharField(max_length=200, blank=True, default='')
+    day = models.DateField()
+    inflow = models.PositiveIntegerField(default=0)
+    outflow = models.PositiveIntegerField(default=0)
+    movements = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item_ref', 'day'], name='rollup_item_day_unique'),
+        ]
+        indexes = [
+            # Relatórios por período: cobre a soma das saídas sem ler a tabela
+            models.Index(fields=['day', 'item_ref', 'outflow', 'inflow'], name='rollup_day_item_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.item_name} ({self.day}): +{self.inflow} / -{self.outflow}'
+
+
+class StockSnapshot(models.Model):
+    """Saldo de um item no instante ``taken_at``, já incluindo as movimentações
+    anteriores a ele. Cada ``taken_at`` é um checkpoint completo: itens sem
+    linha tinham saldo zero. Os checkpoints vêm do comando stock_checkpoint
+    (quantidades atuais) e do arquivamento (``archived``: as movimentações
+    anteriores saíram da tabela)."""
+    item_ref = models.BigIntegerField()
+    item_name = models.CharField(max_length=200, blank=True, default='')
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+    archived = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item_ref', 'taken_at'], name='snapshot_item_taken_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['taken_at', 'item_ref'], name='snapshot_taken_item_idx'),
+            # stock_at verifica se há checkpoints de arquivamento
+            models.Index(fields=['taken_at'], condition=models.Q(archived=True), name='snapshot_archived_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.item_name} em {self.taken_at}: {self.quantity}'
+
+
+class DemandForecast(models.Model):
+    """Última previsão de demanda do item, gravada pelo comando forecast_demand."""
+    item = models.OneToOneField('InventoryItem', on_delete=models.CASCADE, primary_key=True)
+    daily_demand = models.FloatField()
+    demand_std = models.FloatField()
+    # Dias até o estoque acabar na demanda prevista; vazio sem demanda
+    days_of_cover = models.FloatField(blank=True, null=True)
+    reorder_point = models.IntegerField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.item_id}: {self.daily_demand:.2f}/dia, ponto de pedido {self.reorder_point}'
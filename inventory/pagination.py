@@ -0,0 +1,45 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(timestamp, pk):
+    raw = f'{timestamp.isoformat()}|{pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        timestamp, pk = raw.split('|')
+        timestamp, pk = parse_datetime(timestamp), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Cursor de paginação inválido.')
+    if timestamp is None:
+        raise ValueError('Cursor de paginação inválido.')
+    return timestamp, pk
+
+
+def keyset_page(queryset, cursor=None, size=50):
+    """Devolve ``(linhas, próximo_cursor)`` ordenando por (timestamp, id)
+    decrescentes. A página seguinte começa logo depois da última linha vista,
+    então qualquer página custa o mesmo que a primeira."""
+    queryset = queryset.order_by('-timestamp', '-id')
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    rows = list(queryset[:size + 1])
+    if len(rows) > size:
+        rows = rows[:size]
+        return rows, encode_cursor(rows[-1].timestamp, rows[-1].pk)
+    return rows, None
@@ -0,0 +1,272 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+from .stats import percentile
+
+logger = logging.getLogger(__name__)
+
+# Métricas por requisição: tempo e consultas SQL, renderização de templates e
+# inferência do chatbot (caminho por palavras-chave, Keras e spaCy). São
+# devolvidas no cabeçalho Server-Timing, registradas no log quando a
+# requisição é lenta e acumuladas em histogramas por endpoint (/perf/).
+
+CHATBOT_METRICS = ('keyword', 'keras', 'spacy')
+
+# Limites (ms) das faixas dos histogramas; a última faixa é "acima de 2500"
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_current = ContextVar('perf_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def add(self, name, elapsed_ms, count=1):
+        self.durations[name] += elapsed_ms
+        self.counts[name] += count
+
+    def merge(self, other):
+        for name, elapsed_ms in other['durations'].items():
+            self.add(name, elapsed_ms, other['counts'].get(name, 1))
+
+    def as_dict(self):
+        return {'durations': dict(self.durations), 'counts': dict(self.counts)}
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        # Wrapper de connection.execute_wrapper: conta e cronometra cada consulta
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def timed(name):
+    """Soma o tempo do bloco à métrica ``name`` da requisição atual (nada
+    acontece fora de uma requisição instrumentada)."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, (time.perf_counter() - started) * 1000)
+
+
+def run_timed(task, *args):
+    """Executa ``task`` coletando as próprias métricas e devolve
+    ``(resultado, métricas)``. Usado pelo pool de inferência: em outro
+    processo as métricas não chegam à requisição de outra forma."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        return task(*args), metrics.as_dict()
+    finally:
+        _current.reset(token)
+
+
+def merge_metrics(metrics):
+    current = _current.get()
+    if current is not None:
+        current.merge(metrics)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Backend de templates do Django que mede o tempo de renderização."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class EndpointHistograms:
+    """Últimas ``samples`` requisições de cada endpoint, neste processo."""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, endpoint, total_ms, metrics):
+        sample = (
+            total_ms,
+            metrics.durations.get('db', 0.0),
+            metrics.counts.get('db', 0),
+            metrics.durations.get('template', 0.0),
+            sum(metrics.durations.get(name, 0.0) for name in CHATBOT_METRICS),
+        )
+        with self._lock:
+            if endpoint not in self._data:
+                self._data[endpoint] = deque(maxlen=self.samples)
+            self._data[endpoint].append(sample)
+
+    def snapshot(self):
+        with self._lock:
+            data = {endpoint: list(samples) for endpoint, samples in self._data.items()}
+        endpoints = []
+        for endpoint, samples in sorted(data.items()):
+            totals = [sample[0] for sample in samples]
+            buckets = [0] * (len(BUCKETS_MS) + 1)
+            for total in totals:
+                buckets[sum(total > limit for limit in BUCKETS_MS)] += 1
+            count = len(samples)
+            endpoints.append({
+                'endpoint': endpoint,
+                'count': count,
+                'p50_ms': percentile(totals, 0.50),
+                'p95_ms': percentile(totals, 0.95),
+                'max_ms': max(totals),
+                'db_ms': sum(sample[1] for sample in samples) / count,
+                'queries': sum(sample[2] for sample in samples) / count,
+                'template_ms': sum(sample[3] for sample in samples) / count,
+                'chatbot_ms': sum(sample[4] for sample in samples) / count,
+                'buckets': buckets,
+            })
+        return endpoints
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+histograms = EndpointHistograms(settings.PERF_HISTOGRAM_SAMPLES)
+
+
+def bucket_labels():
+    labels = [f'≤ {limit} ms' for limit in BUCKETS_MS]
+    return labels + [f'> {BUCKETS_MS[-1]} ms']
+
+
+def server_timing(metrics, total_ms):
+    entries = []
+    if metrics.counts.get('db'):
+        entries.append(f'db;dur={metrics.durations["db"]:.1f};desc="{metrics.counts["db"]} consultas"')
+    if metrics.counts.get('template'):
+        entries.append(f'tpl;dur={metrics.durations["template"]:.1f}')
+    for name in CHATBOT_METRICS:
+        if metrics.counts.get(name):
+            entries.append(f'{name};dur={metrics.durations[name]:.1f}')
+    entries.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(entries)
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'não resolvido'
+    return match.view_name or match.route
+
+
+class PerformanceMiddleware:
+    """Mede cada requisição e adiciona o cabeçalho Server-Timing. Deve ser o
+    primeiro middleware, para que o total inclua os demais. Funciona nos
+    modos síncrono e assíncrono, para não obrigar o Django a adaptar a pilha
+    inteira (e as views async do chat) para o modo síncrono. Em respostas em
+    streaming o total não inclui a geração do conteúdo."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.PERF_ENABLED:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.wrap_queries(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        if not settings.PERF_ENABLED:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        started = time.perf_counter()
+        token = _current.set(metrics)
+        stack = ExitStack()
+        try:
+            # As conexões são locais à thread: o wrapper é instalado na thread
+            # em que o Django executa o código síncrono da requisição
+            # (views síncronas e ORM), a mesma usada pelo sync_to_async.
+            await sync_to_async(self.wrap_queries)(stack, metrics)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    @staticmethod
+    def wrap_queries(stack, metrics):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.query_wrapper))
+
+    def finish(self, request, response, metrics, started):
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response['Server-Timing'] = server_timing(metrics, total_ms)
+        endpoint = _endpoint(request)
+        histograms.record(endpoint, total_ms, metrics)
+        if total_ms >= settings.PERF_SLOW_REQUEST_MS:
+            logger.warning('Requisição lenta: %s', json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'queries': metrics.counts.get('db', 0),
+                'db_ms': round(metrics.durations.get('db', 0.0), 1),
+                'template_ms': round(metrics.durations.get('template', 0.0), 1),
+                **{f'{name}_ms': round(metrics.durations[name], 1) for name in CHATBOT_METRICS
+                   if metrics.counts.get(name)},
+            }, ensure_ascii=False))
+        return response
@@ -0,0 +1,149 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyMovementRollup, InventoryItem, MovementLog, StockSnapshot
+
+QUERY_CHUNK_SIZE = 900
+
+# A exclusão de um item (REMOVE) baixa o saldo restante, mas não é uma saída:
+# conta só em ``movements``, fora do relatório de mais vendidos e da previsão
+OUTFLOW = Q(change__lt=0) & ~Q(action_type='REMOVE')
+
+_UPSERT = (
+    'INSERT INTO {table} (item_ref, item_name, day, inflow, outflow, movements) '
+    'VALUES (%s, %s, %s, %s, %s, %s) '
+    'ON CONFLICT (item_ref, day) DO UPDATE SET '
+    'inflow = {table}.inflow + excluded.inflow, '
+    'outflow = {table}.outflow + excluded.outflow, '
+    'movements = {table}.movements + excluded.movements, '
+    "item_name = COALESCE(NULLIF(excluded.item_name, ''), {table}.item_name)"
+)
+
+
+def _item_names(item_ids):
+    item_ids = list(item_ids)
+    names = {}
+    for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+        names.update(InventoryItem.objects
+                     .filter(pk__in=item_ids[start:start + QUERY_CHUNK_SIZE])
+                     .values_list('id', 'name'))
+    return names
+
+
+def add_to_rollup(logs):
+    """Soma as movimentações ao rollup diário, um upsert por (item, dia).
+    Deve rodar na mesma transação que grava os logs."""
+    totals = defaultdict(lambda: [0, 0, 0])
+    for log in logs:
+        # item_ref continua preenchido quando o item já foi excluído
+        item_ref = log.item_ref if log.item_ref is not None else log.item_id
+        if item_ref is None:
+            continue
+        entry = totals[(item_ref, timezone.localdate(log.timestamp))]
+        if log.change > 0:
+            entry[0] += log.change
+        elif log.action_type != 'REMOVE':
+            entry[1] -= log.change
+        entry[2] += 1
+    if not totals:
+        return
+
+    names = _item_names({item_id for item_id, _ in totals})
+    table = DailyMovementRollup._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.executemany(_UPSERT.format(table=table), [
+            (item_id, names.get(item_id, ''), day.isoformat(), inflow, outflow, movements)
+            for (item_id, day), (inflow, outflow, movements) in totals.items()
+        ])
+
+
+def _deleted_item_names():
+    # Último nome conhecido dos itens já excluídos, antes de apagar o rollup
+    names = {}
+    existing = InventoryItem.objects.values('id')
+    for model, order in ((DailyMovementRollup, '-day'), (StockSnapshot, '-taken_at')):
+        for item_ref, name in (model.objects
+                               .exclude(item_ref__in=existing)
+                               .exclude(item_name='')
+                               .order_by('item_ref', order)
+                               .values_list('item_ref', 'item_name')):
+            names.setdefault(item_ref, name)
+    return names
+
+
+def rebuild_rollup(since=None, batch_size=1000):
+    """Recalcula o rollup a partir do MovementLog, inteiro ou a partir da data
+    ``since``. Como no caminho incremental, os logs são agrupados por
+    ``item_ref`` e os itens já excluídos continuam no rollup, com o último
+    nome conhecido. Movimentações já arquivadas não estão mais na tabela:
+    depois de um arquivamento use ``since`` posterior ao corte."""
+    logs = MovementLog.objects.filter(item_ref__isnull=False)
+    rollups = DailyMovementRollup.objects.all()
+    if since is not None:
+        logs = logs.filter(timestamp__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+
+    rows = (logs
+            .annotate(day=TruncDate('timestamp'))
+            .values('item_ref', 'day')
+            .annotate(inflow=Sum('change', filter=Q(change__gt=0)),
+                      outflow=Sum('change', filter=OUTFLOW),
+                      movements=Count('id'),
+                      item_name=Max('item__name'))
+            .order_by())
+
+    created = 0
+    with transaction.atomic():
+        deleted_names = _deleted_item_names()
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailyMovementRollup(
+                item_ref=row['item_ref'], day=row['day'], inflow=row['inflow'] or 0,
+                outflow=-(row['outflow'] or 0), movements=row['movements'],
+                item_name=row['item_name'] or deleted_names.get(row['item_ref'], ''),
+            ))
+            if len(batch) >= batch_size:
+                created += len(DailyMovementRollup.objects.bulk_create(batch))
+                batch = []
+        created += len(DailyMovementRollup.objects.bulk_create(batch))
+    return created
+
+
+def top_items(start=None, end=None, limit=10):
+    """Itens com mais saídas entre ``start`` e ``end`` (datas, inclusivas).
+    Lê apenas o rollup: o custo depende do período, não do histórico."""
+    rollups = DailyMovementRollup.objects.all()
+    if start is not None:
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        rollups = rollups.filter(day__lte=end)
+
+    report = list(rollups
+                  .values('item_ref')
+                  .annotate(total_sold=Sum('outflow'), total_received=Sum('inflow'))
+                  .filter(total_sold__gt=0)
+                  .order_by('-total_sold', 'item_ref')[:limit])
+
+    # Nome mais recente de cada item do relatório
+    names = {}
+    for item_ref, name in (DailyMovementRollup.objects
+                           .filter(item_ref__in=[row['item_ref'] for row in report])
+                           .exclude(item_name='')
+                           .order_by('item_ref', '-day')
+                           .values_list('item_ref', 'item_name')):
+        names.setdefault(item_ref, name)
+    for row in report:
+        row['item_name'] = names.get(row['item_ref'], f"Item #{row['item_ref']}")
+    return report
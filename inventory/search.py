@@ -0,0 +1,168 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from unidecode import unidecode
+
+from .models import InventoryItem
+
+# Tabela FTS5 criada pela migração 0010 (apenas no SQLite). O rowid é o id do
+# item; 'owner' guarda o dono como um termo ('u<id>') para que o filtro por
+# usuário também seja resolvido pelo índice.
+SEARCH_TABLE = 'inventory_item_search'
+
+QUERY_CHUNK_SIZE = 900
+
+# Pesos do bm25 para name, category e owner
+RANK_WEIGHTS = (10.0, 5.0, 0.0)
+
+
+def fold(text):
+    # Mesma normalização do chatbot: sem acentos e minúscula ("Açúcar" -> "acucar")
+    return unidecode(text or '').lower()
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _owner_term(user_id):
+    return f'u{user_id}' if user_id is not None else ''
+
+
+def build_match_query(text, user_id):
+    """Monta a expressão MATCH: todos os termos (como prefixo) no nome ou na
+    categoria, restritos ao dono. Devolve None se não houver termos."""
+    terms = re.findall(r'\w+', fold(text))
+    if not terms:
+        return None
+    phrases = ' AND '.join(f'{{name category}} : "{term}"*' for term in terms)
+    return f'owner : "{_owner_term(user_id)}" AND {phrases}'
+
+
+def index_items(item_ids):
+    """(Re)indexa os itens informados; os que não existem mais saem do índice."""
+    if not fts_enabled():
+        return
+    item_ids = list(item_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+            chunk = item_ids[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', chunk)
+            rows = (InventoryItem.objects
+                    .filter(pk__in=chunk)
+                    .values_list('id', 'name', 'category__name', 'user_id'))
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, category, owner) VALUES (%s, %s, %s, %s)',
+                [(item_id, fold(name), fold(category), _owner_term(user_id))
+                 for item_id, name, category, user_id in rows]
+            )
+
+
+def remove_items(item_ids):
+    if not fts_enabled():
+        return
+    item_ids = list(item_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+            chunk = item_ids[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', chunk)
+
+
+def rebuild_index():
+    """Recria o índice inteiro a partir dos itens."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    ids = list(InventoryItem.objects.values_list('id', flat=True))
+    index_items(ids)
+    return len(ids)
+
+
+def load_items(item_ids, queryset=None):
+    """Carrega os itens mantendo a ordem de ``item_ids``."""
+    if queryset is None:
+        queryset = InventoryItem.objects.select_related('category', 'demandforecast')
+    items = queryset.in_bulk(item_ids)
+    return [items[item_id] for item_id in item_ids if item_id in items]
+
+
+def _fallback_items(user_id, text):
+    items = InventoryItem.objects.filter(user=user_id)
+    for term in (text or '').split():
+        items = items.filter(Q(name__icontains=term) | Q(category__name__icontains=term))
+    return items.order_by('id')
+
+
+def search_item_ids(user_id, text, limit=None, offset=0):
+    """IDs dos itens do usuário que casam com ``text``, do mais relevante para
+    o menos relevante. Cada termo casa como prefixo e sem acentos ("acu"
+    encontra "AÇÚCAR"). ``limit``/``offset`` paginam dentro da própria
+    consulta. Em bancos sem FTS5 usa ``icontains`` por id."""
+    if not fts_enabled():
+        ids = _fallback_items(user_id, text).values_list('id', flat=True)
+        return list(ids[offset:offset + limit] if limit is not None else ids[offset:])
+
+    query = build_match_query(text, user_id)
+    if query is None:
+        return []
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    with connection.cursor() as cursor:
+        # LIMIT -1: sem limite no SQLite
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT %s OFFSET %s',
+            [query, -1 if limit is None else limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def count_matches(user_id, text):
+    """Quantos itens do usuário casam com ``text`` (mesmas regras de ``search_item_ids``)."""
+    if not fts_enabled():
+        return _fallback_items(user_id, text).count()
+
+    query = build_match_query(text, user_id)
+    if query is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [query])
+        return cursor.fetchone()[0]
+
+
+class SearchResults:
+    """IDs de uma busca para o Paginator: ``count()`` conta no índice e cada
+    página vira um LIMIT/OFFSET na consulta FTS, sem carregar os demais ids."""
+
+    def __init__(self, user_id, text):
+        self.user_id = user_id
+        self.text = text
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = count_matches(self.user_id, self.text)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = key.start or 0
+            limit = None if key.stop is None else max(key.stop - start, 0)
+            return search_item_ids(self.user_id, self.text, limit=limit, offset=start)
+        ids = search_item_ids(self.user_id, self.text, limit=1, offset=key)
+        if not ids:
+            raise IndexError(key)
+        return ids[0]
@@ -0,0 +1,82 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .inventory_cache import bump_category_version, bump_inventory_version
+from .low_stock import item_removed, sync_low_stock, transfer_flag
+from .models import Category, InventoryItem
+from .search import index_items, remove_items
+
+
+@receiver([post_save, post_delete], sender=InventoryItem)
+def inventory_item_changed(sender, instance, **kwargs):
+    # Só depois do commit, para ninguém recalcular a contagem com dados antigos
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_inventory_version(user_id))
+
+
+@receiver(pre_save, sender=InventoryItem)
+def remember_stock_state(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._stock_state = None
+    if instance.pk:
+        instance._stock_state = (InventoryItem.objects
+                                 .filter(pk=instance.pk)
+                                 .values_list('user_id', 'low_stock')
+                                 .first())
+
+
+@receiver(post_save, sender=InventoryItem)
+def update_low_stock_on_save(sender, instance, raw=False, **kwargs):
+    # Cobre AddItem, EditItem e edições pelo admin
+    if raw:
+        return
+    old_user_id, old_low = getattr(instance, '_stock_state', None) or (None, False)
+    transfer_flag(old_user_id, old_low, instance.user_id, instance.low_stock)
+    sync_low_stock([instance.pk])
+
+
+@receiver(post_delete, sender=InventoryItem)
+def update_low_stock_on_delete(sender, instance, **kwargs):
+    item_removed(instance.user_id, instance.low_stock)
+
+
+@receiver(post_save, sender=InventoryItem)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_items([instance.pk])
+
+
+@receiver(post_delete, sender=InventoryItem)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_items([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created=False, raw=False, **kwargs):
+    # O nome da categoria faz parte do índice de busca dos itens
+    if not raw and not created:
+        index_items(InventoryItem.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_items(sender, instance, **kwargs):
+    instance._item_ids = list(InventoryItem.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_uncategorized_items(sender, instance, **kwargs):
+    index_items(getattr(instance, '_item_ids', []))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_category_version)
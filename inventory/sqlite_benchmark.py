@@ -0,0 +1,121 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from .stats import percentile
+
+# Benchmark de leitura/escrita concorrente em vários processos, comparando a
+# configuração padrão do SQLite (journal DELETE, synchronous FULL, conexão
+# nova por requisição, transação DEFERRED) com a de sqlite_tuning. Usa um
+# arquivo temporário com tabelas no formato de InventoryItem/MovementLog, e
+# não o banco da aplicação.
+
+SCHEMA = [
+    'CREATE TABLE item (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name TEXT NOT NULL, '
+    'quantity INTEGER NOT NULL)',
+    'CREATE INDEX item_user_quantity ON item (user_id, quantity)',
+    'CREATE TABLE movement (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, change INTEGER NOT NULL, '
+    'timestamp REAL NOT NULL)',
+]
+
+USERS = 20
+
+# Timeout padrão do módulo sqlite3 do Python (o Django não o altera)
+DEFAULT_TIMEOUT = 5.0
+
+
+def create_database(path, items, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.executemany(
+        'INSERT INTO item (id, user_id, name, quantity) VALUES (?, ?, ?, ?)',
+        [(n, rng.randrange(USERS), f'ITEM {n}', rng.randint(0, 500)) for n in range(1, items + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_worker(path, statements, persistent, begin, writer, items, seed, start_at, seconds):
+    """Executa operações até o fim do tempo e devolve contagens e latências (ms).
+    Leitores listam os itens de um usuário por quantidade (como o painel);
+    escritores alteram a quantidade de um item e gravam o log na mesma transação."""
+    rng = random.Random(seed)
+
+    def connect():
+        conn = sqlite3.connect(path, timeout=DEFAULT_TIMEOUT, isolation_level=None)
+        for statement in statements:
+            conn.execute(statement)
+        return conn
+
+    conn = connect() if persistent else None
+    latencies = []
+    errors = 0
+    time.sleep(max(0.0, start_at - time.time()))
+    end = time.time() + seconds
+    while time.time() < end:
+        started = time.perf_counter()
+        current = conn or connect()
+        try:
+            if writer:
+                item_id = rng.randint(1, items)
+                change = rng.choice((-1, 1))
+                current.execute(begin)
+                current.execute('UPDATE item SET quantity = quantity + ? WHERE id = ?', (change, item_id))
+                current.execute('INSERT INTO movement (item_id, change, timestamp) VALUES (?, ?, ?)',
+                                (item_id, change, time.time()))
+                current.execute('COMMIT')
+            else:
+                current.execute('SELECT id, name, quantity FROM item WHERE user_id = ? ORDER BY quantity LIMIT 50',
+                                (rng.randrange(USERS),)).fetchall()
+            latencies.append((time.perf_counter() - started) * 1000)
+        except sqlite3.OperationalError:
+            errors += 1
+            if current.in_transaction:
+                current.execute('ROLLBACK')
+        finally:
+            if conn is None:
+                current.close()
+    if conn is not None:
+        conn.close()
+    return {'writer': writer, 'latencies': latencies, 'errors': errors}
+
+
+def run_benchmark(statements, persistent, begin, processes=4, writers=2, seconds=5.0, items=5000, seed=42,
+                  directory=None):
+    """Roda ``processes`` processos (``writers`` deles escrevendo) sobre um
+    banco novo e devolve as operações por segundo, os erros de lock e as
+    latências p50/p95 de leitura e escrita."""
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        path = os.path.join(tmp, 'benchmark.sqlite3')
+        create_database(path, items, seed)
+        context = multiprocessing.get_context('spawn')
+        start_at = time.time() + 2.0  # tempo para os processos iniciarem
+        with context.Pool(processes) as pool:
+            results = pool.starmap(run_worker, [
+                (path, statements, persistent, begin, number < writers, items, seed + number, start_at, seconds)
+                for number in range(processes)
+            ])
+
+    summary = {}
+    for kind, writer in (('read', False), ('write', True)):
+        latencies = [value for result in results if result['writer'] == writer for value in result['latencies']]
+        summary[kind] = {
+            'ops': len(latencies),
+            'ops_per_second': len(latencies) / seconds,
+            'errors': sum(result['errors'] for result in results if result['writer'] == writer),
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+        }
+    return summary
@@ -0,0 +1,33 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+from django.conf import settings
+
+
+def pragmas():
+    """PRAGMAs configurados em settings (SQLITE_*), na ordem de aplicação."""
+    return [
+        f'PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}',
+        f'PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}',
+        f'PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}',
+        f'PRAGMA cache_size = {int(settings.SQLITE_CACHE_SIZE)}',
+        f'PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}',
+    ]
+
+
+def apply_pragmas(cursor, statements):
+    for statement in statements:
+        cursor.execute(statement)
+
+
+def configure_connection(sender, connection, **kwargs):
+    # Receptor de connection_created: roda uma vez por conexão, que com
+    # CONN_MAX_AGE é reaproveitada entre requisições
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas())
@@ -0,0 +1,159 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .audit import log_movement, log_movements
+from .inventory_cache import bump_inventory_version
+from .low_stock import sync_low_stock
+from .models import InventoryItem, MovementLog
+
+
+class InsufficientStock(Exception):
+    """A saída deixaria o estoque do item negativo."""
+
+
+class StockConflict(Exception):
+    """O estoque mudou durante um lote e alguma saída ficaria negativa."""
+
+
+ACTION_TYPES = {choice for choice, _ in MovementLog.ACTION_CHOICES}
+
+# Limite de parâmetros por consulta no SQLite
+QUERY_CHUNK_SIZE = 900
+
+
+def adjust_stock(item_id, change, action_type, user=None, observation=None):
+    """Aplica ``change`` à quantidade do item com um único UPDATE condicional
+    (``quantity = quantity + change``) e registra a movimentação na mesma
+    transação. Saídas maiores que o estoque levantam ``InsufficientStock``."""
+    items = InventoryItem.objects.filter(pk=item_id)
+    if change < 0:
+        items = items.filter(quantity__gte=-change)
+
+    with transaction.atomic():
+        if not items.update(quantity=F('quantity') + change):
+            if not InventoryItem.objects.filter(pk=item_id).exists():
+                raise InventoryItem.DoesNotExist()
+            raise InsufficientStock()
+
+        # O UPDATE com F() não dispara post_save: invalida as contagens do dono
+        owner_id = InventoryItem.objects.filter(pk=item_id).values_list('user_id', flat=True).first()
+        transaction.on_commit(lambda: bump_inventory_version(owner_id))
+        sync_low_stock([item_id])
+
+        return log_movement(item_id, change, action_type, user=user, observation=observation)
+
+
+def _chunks(values, size=QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _validate_movement(line):
+    if not isinstance(line, dict):
+        return 'Cada movimentação deve ser um objeto.'
+    item_id, delta = line.get('item_id'), line.get('delta')
+    if not isinstance(item_id, int) or isinstance(item_id, bool):
+        return "'item_id' deve ser um número inteiro."
+    if not isinstance(delta, int) or isinstance(delta, bool) or delta == 0:
+        return "'delta' deve ser um número inteiro diferente de zero."
+    action_type = line.get('action_type')
+    if action_type is not None and action_type not in ACTION_TYPES:
+        return f"'action_type' inválido: {action_type}."
+    observation = line.get('observation')
+    if observation is not None and not isinstance(observation, str):
+        return "'observation' deve ser um texto."
+    return None
+
+
+def apply_movements(lines, user=None, items=None):
+    """Aplica uma lista de movimentações ``{item_id, delta, action_type,
+    observation}`` em uma única transação e devolve o resultado de cada linha.
+
+    As linhas são avaliadas em ordem sobre o saldo de cada item; as que
+    deixariam o estoque negativo são rejeitadas e as demais aplicadas. As
+    quantidades são atualizadas com um UPDATE por grupo de itens com o mesmo
+    saldo líquido e os logs inseridos com ``bulk_create``. ``items`` restringe
+    os itens que podem ser movimentados (ex.: apenas os do usuário).
+    """
+    if items is None:
+        items = InventoryItem.objects.all()
+
+    results = []
+    valid = []
+    for number, line in enumerate(lines):
+        error = _validate_movement(line)
+        if error:
+            results.append({'line': number, 'status': 'invalid', 'error': error})
+        else:
+            results.append(None)
+            valid.append((number, line))
+
+    with transaction.atomic():
+        quantities = {}
+        owners = {}
+        for chunk in _chunks({line['item_id'] for _, line in valid}):
+            for item_id, quantity, user_id in items.filter(pk__in=chunk).values_list('id', 'quantity', 'user_id'):
+                quantities[item_id] = quantity
+                owners[item_id] = user_id
+
+        balances = dict(quantities)
+        # Maior queda acumulada de cada item em relação ao saldo inicial
+        drawdowns = defaultdict(int)
+        logs = []
+        for number, line in valid:
+            item_id, delta = line['item_id'], line['delta']
+            if item_id not in balances:
+                results[number] = {'line': number, 'item_id': item_id, 'status': 'not_found',
+                                   'error': 'Item não encontrado.'}
+                continue
+            if balances[item_id] + delta < 0:
+                results[number] = {'line': number, 'item_id': item_id, 'status': 'rejected',
+                                   'error': f'Estoque insuficiente: restam {balances[item_id]} unidades.'}
+                continue
+
+            balances[item_id] += delta
+            drawdowns[item_id] = max(drawdowns[item_id], quantities[item_id] - balances[item_id])
+            results[number] = {'line': number, 'item_id': item_id, 'status': 'applied',
+                               'quantity': balances[item_id]}
+            logs.append(MovementLog(
+                item_id=item_id,
+                change=delta,
+                action_type=line.get('action_type') or ('INCREASE' if delta > 0 else 'DECREASE'),
+                observation=line.get('observation'),
+                user=user
+            ))
+
+        # Agrupa os itens com o mesmo saldo líquido e a mesma queda máxima:
+        # a condição quantity >= queda garante que nenhuma saída fique negativa
+        # mesmo que outro processo tenha alterado o estoque desde a leitura
+        groups = defaultdict(list)
+        for item_id in drawdowns:
+            net = balances[item_id] - quantities[item_id]
+            if net or drawdowns[item_id]:
+                groups[(net, drawdowns[item_id])].append(item_id)
+
+        for (net, drawdown), item_ids in groups.items():
+            for chunk in _chunks(item_ids):
+                updated = (InventoryItem.objects
+                           .filter(pk__in=chunk, quantity__gte=drawdown)
+                           .update(quantity=F('quantity') + net))
+                if updated != len(chunk):
+                    raise StockConflict()
+
+        log_movements(logs)
+        changed_items = [item_id for item_ids in groups.values() for item_id in item_ids]
+        sync_low_stock(changed_items)
+        changed_owners = [owners[item_id] for item_id in changed_items]
+        transaction.on_commit(lambda: bump_inventory_version(*changed_owners))
+
+    return results
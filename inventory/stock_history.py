@@ -0,0 +1,115 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .models import DailyMovementRollup, InventoryItem, MovementLog, StockSnapshot
+
+QUERY_CHUNK_SIZE = 900
+
+
+class HistoryUnavailable(Exception):
+    """As movimentações do período pedido foram arquivadas e não há
+    checkpoint anterior à data."""
+
+
+def take_checkpoint(batch_size=2000):
+    """Grava a quantidade atual de todos os itens como um checkpoint.
+    Rodar periodicamente (ex.: diariamente pelo cron com o comando
+    stock_checkpoint) limita o replay de ``stock_at`` ao intervalo entre
+    checkpoints."""
+    with transaction.atomic():
+        taken_at = timezone.now()
+        batch = []
+        created = 0
+        rows = (InventoryItem.objects
+                .exclude(quantity=0)
+                .values_list('id', 'name', 'quantity')
+                .iterator(chunk_size=batch_size))
+        for item_id, name, quantity in rows:
+            batch.append(StockSnapshot(item_ref=item_id, item_name=name, taken_at=taken_at, quantity=quantity))
+            if len(batch) >= batch_size:
+                created += len(StockSnapshot.objects.bulk_create(batch, batch_size=500))
+                batch = []
+        created += len(StockSnapshot.objects.bulk_create(batch, batch_size=500))
+    return taken_at, created
+
+
+def _chunked_filter(queryset, field, values):
+    values = list(values)
+    for start in range(0, len(values), QUERY_CHUNK_SIZE):
+        yield queryset.filter(**{f'{field}__in': values[start:start + QUERY_CHUNK_SIZE]})
+
+
+def stock_at(moment, item_refs=None):
+    """Quantidade de cada item imediatamente antes de ``moment``: o
+    checkpoint mais recente até ``moment`` mais as movimentações entre os
+    dois. Sem checkpoint anterior, parte do checkpoint seguinte (ou das
+    quantidades atuais, com zero para itens excluídos) e desfaz as
+    movimentações a partir de ``moment``; o saldo inicial nunca é presumido
+    zero, já que o começo do histórico pode ter sido apagado. Sem
+    ``item_refs``, devolve todos os itens com saldo diferente de zero.
+    Devolve ``(quantidades, instante do checkpoint usado ou None)``."""
+    checkpoint = (StockSnapshot.objects
+                  .filter(taken_at__lte=moment)
+                  .aggregate(taken_at=Max('taken_at'))['taken_at'])
+    logs = MovementLog.objects.filter(item_ref__isnull=False)
+    if checkpoint is not None:
+        sign = 1
+        base = StockSnapshot.objects.filter(taken_at=checkpoint).values_list('item_ref', 'quantity')
+        logs = logs.filter(timestamp__gte=checkpoint, timestamp__lt=moment)
+    else:
+        if StockSnapshot.objects.filter(archived=True).exists():
+            raise HistoryUnavailable()
+        sign = -1
+        checkpoint = (StockSnapshot.objects
+                      .filter(taken_at__gt=moment)
+                      .aggregate(taken_at=Min('taken_at'))['taken_at'])
+        logs = logs.filter(timestamp__gte=moment)
+        if checkpoint is not None:
+            base = StockSnapshot.objects.filter(taken_at=checkpoint).values_list('item_ref', 'quantity')
+            logs = logs.filter(timestamp__lt=checkpoint)
+        else:
+            base = InventoryItem.objects.values_list('id', 'quantity')
+    logs = logs.values('item_ref').annotate(total=Sum('change')).values_list('item_ref', 'total').order_by()
+
+    if item_refs is None:
+        base_sets, log_sets = [base], [logs]
+    else:
+        field = 'pk' if base.model is InventoryItem else 'item_ref'
+        base_sets = _chunked_filter(base, field, item_refs)
+        log_sets = _chunked_filter(logs, 'item_ref', item_refs)
+
+    quantities = {}
+    for queryset in base_sets:
+        quantities.update(queryset)
+    for queryset in log_sets:
+        for item_ref, total in queryset:
+            quantities[item_ref] = quantities.get(item_ref, 0) + sign * total
+
+    if item_refs is None:
+        quantities = {item_ref: quantity for item_ref, quantity in quantities.items() if quantity}
+    else:
+        quantities = {item_ref: quantities.get(item_ref, 0) for item_ref in item_refs}
+    return quantities, checkpoint
+
+
+def item_names(item_refs):
+    """Nome atual de cada item; para itens excluídos, o último nome conhecido."""
+    item_refs = list(item_refs)
+    names = {}
+    for queryset in _chunked_filter(InventoryItem.objects.all(), 'pk', item_refs):
+        names.update(queryset.values_list('id', 'name'))
+    missing = [item_ref for item_ref in item_refs if item_ref not in names]
+    for model, order in ((StockSnapshot, '-taken_at'), (DailyMovementRollup, '-day')):
+        for queryset in _chunked_filter(model.objects.exclude(item_name=''), 'item_ref', missing):
+            for item_ref, name in queryset.order_by('item_ref', order).values_list('item_ref', 'item_name'):
+                names.setdefault(item_ref, name)
+        missing = [item_ref for item_ref in missing if item_ref not in names]
+    return names
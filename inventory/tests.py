@@ -1,3 +1,1489 @@
-from django.test import TestCase
+import gzip
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+
+from .batching import MicroBatcher
+from .benchmarks import compare, run_benchmarks as run_view_benchmarks, seed_dataset
+from .write_behind import WriteBehindBuffer
+from .inference_pool import chat_task, inference_pool
+from .keyword_matcher import KeywordMatcher, KeywordTable
+from .model_registry import ModelRegistry
+from .perf import PerformanceMiddleware, histograms, run_timed, timed
+from .archiving import archive_movements, archive_path, iter_archived
+from . import audit
+from .audit import log_movement, log_movements
+from .forecasting import forecast, run_forecast
+from .low_stock import low_stock_count, rebuild_low_stock
+from .models import (Category, DailyMovementRollup, DemandForecast, InventoryItem, MovementLog, StockSnapshot,
+                     StockSummary)
+from .rollup import top_items
+from .search import rebuild_index, search_item_ids
+from .sqlite_benchmark import run_benchmark
+from .sqlite_tuning import pragmas
+from .stock_history import HistoryUnavailable, stock_at, take_checkpoint
+from .stock import apply_movements, StockConflict
+from .importing import import_items
+from .response_cache import LRUCache, MISSING
+from . import stock, utils, views
+from inventory_management.log_config import SamplingFilter, build_logging, queue_handler
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_loader_runs_once_on_first_get(self):
+        calls = []
+        registry = ModelRegistry()
+        registry.register('model', lambda: calls.append(1) or 'loaded')
+
+        self.assertFalse(registry.is_loaded('model'))
+        self.assertEqual(registry.get('model'), 'loaded')
+        self.assertEqual(registry.get('model'), 'loaded')
+        self.assertEqual(len(calls), 1)
+        self.assertIn('model', registry.load_times())
+
+    def test_warm_up_in_background(self):
+        registry = ModelRegistry()
+        registry.register('model', lambda: 'loaded')
+
+        registry.warm_up(background=True).join()
+
+        self.assertTrue(registry.is_loaded('model'))
+
+    @override_settings(CHATBOT_WARMUP=True)
+    def test_warm_up_only_from_the_server_entry_points(self):
+        import importlib
+        from django.apps import apps
+
+        with mock.patch('inventory.utils.warm_up') as warm_up:
+            apps.get_app_config('inventory').ready()
+            warm_up.assert_not_called()
+
+            sys.modules.pop('inventory_management.wsgi', None)
+            importlib.import_module('inventory_management.wsgi')
+            warm_up.assert_called_once_with(background=True)
+
+    def test_views_do_not_import_chatbot_libraries(self):
+        code = (
+            'import sys, django; django.setup(); import inventory.urls; '
+            'print(any(m in sys.modules for m in ("spacy", "tensorflow")))'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True, text=True, check=True,
+            env={'DJANGO_SETTINGS_MODULE': 'inventory_management.settings', 'PATH': ''},
+        ).stdout
+        self.assertEqual(output.strip(), 'False')
+
+
+class KeywordMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.groups = [['bom dia', 'oi'], ['rede', 'internet'], ['internet caiu'], ['']]
+
+    def test_first_entry_wins(self):
+        matcher = KeywordMatcher(self.groups[:3])
+
+        self.assertEqual(matcher.match('a internet caiu, oi'), 0)
+        self.assertEqual(matcher.match('a internet caiu'), 1)
+        self.assertIsNone(matcher.match('impressora'))
+
+    def test_matches_substring_search(self):
+        matcher = KeywordMatcher(self.groups)
+        for text in ['', 'boi', 'bom di', 'minha rede', 'xinternet caiux']:
+            expected = next(
+                i for i, group in enumerate(self.groups) if any(k in text for k in group)
+            )
+            self.assertEqual(matcher.match(text), expected)
+
+    def test_table_rebuilds_only_when_mtime_changes(self):
+        loads = []
+
+        def loader(path):
+            loads.append(path)
+            with open(path, encoding='utf-8') as file:
+                return [{'keywords': [file.read()], 'responses': ['ok']}]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'keywords.json')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('smb')
+            table = KeywordTable(path, loader)
+
+            table.get()
+            table.get()
+            self.assertEqual(len(loads), 1)
+
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('wifi')
+            os.utime(path, ns=(0, 0))
+            entries, matcher = table.get()
+            self.assertEqual(len(loads), 2)
+            self.assertEqual(matcher.match('wifi da sala'), 0)
+
+
+@override_settings(CHATBOT_INFERENCE_POOL_SIZE=0)
+class ChatBatchViewTests(SimpleTestCase):
+    def test_classifies_all_messages_in_one_call(self):
+        intents = [[{'intent': 'greeting', 'probability': '0.9'}], [{'intent': 'goodbye', 'probability': '0.8'}]]
+        with mock.patch('inventory.utils.predict_classes', return_value=intents) as predict:
+            response = self.client.post(
+                reverse('chat_batch'), {'messages': ['oi', 'tchau']}, content_type='application/json'
+            )
+
+        predict.assert_called_once_with(['oi', 'tchau'])
+        self.assertEqual(response.json()['results'][1], {'message': 'tchau', 'intents': intents[1]})
+
+    def test_rejects_invalid_payload(self):
+        response = self.client.post(reverse('chat_batch'), {'messages': 'oi'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_calls_share_batches(self):
+        calls = []
+
+        def double(items):
+            calls.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50)
+        results = {}
+        threads = [
+            threading.Thread(target=lambda n=n: results.__setitem__(n, batcher.submit(n)))
+            for n in range(16)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {n: n * 2 for n in range(16)})
+        self.assertLess(len(calls), 16)
+        self.assertTrue(all(size <= 8 for size in calls))
+        stats = batcher.stats()
+        self.assertEqual(stats['items'], 16)
+        self.assertEqual(stats['batches'], len(calls))
+
+    def test_errors_reach_every_caller(self):
+        def fail(items):
+            raise RuntimeError('modelo indisponível')
+
+        batcher = MicroBatcher(fail, max_wait_ms=1)
+
+        with self.assertRaises(RuntimeError):
+            batcher.submit('oi')
+
+
+class WriteBehindBufferTests(SimpleTestCase):
+    def test_flushes_by_size_and_on_close(self):
+        written = []
+        flushed = threading.Event()
+
+        def write(items):
+            written.append(list(items))
+            flushed.set()
+
+        buffer = WriteBehindBuffer(write, max_rows=3, max_wait_ms=60000)
+        for n in range(3):
+            buffer.submit(n)
+        self.assertTrue(flushed.wait(5))
+        buffer.submit(3)
+        buffer.close()
+
+        self.assertEqual(written, [[0, 1, 2], [3]])
+        self.assertEqual(buffer.stats()['written'], 4)
+
+    def test_failed_write_keeps_items_in_order(self):
+        attempts = []
+
+        def write(items):
+            attempts.append(list(items))
+            if len(attempts) == 1:
+                raise RuntimeError('banco indisponível')
+
+        buffer = WriteBehindBuffer(write, max_wait_ms=60000)
+        buffer.submit('a')
+        with self.assertRaises(RuntimeError):
+            buffer.flush()
+        buffer.submit('b')
+        buffer.flush()
+
+        self.assertEqual(attempts, [['a'], ['a', 'b']])
+        self.assertEqual(buffer.stats()['failures'], 1)
+        buffer.close()
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'app.jsonl')
+
+    def make_logger(self, name, rules=None):
+        handler = queue_handler(self.path, console=False)
+        handler.addFilter(SamplingFilter(rules))
+        self.addCleanup(handler.listener.stop)
+        logger = logging.getLogger(name)
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        return logger, handler
+
+    def read(self):
+        with open(self.path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_records_are_written_as_json_by_the_listener(self):
+        logger, handler = self.make_logger('inventory.tests.pipeline', rules={'inventory.tests.pipeline.sql': 3})
+        sql = logging.getLogger('inventory.tests.pipeline.sql')
+        for number in range(6):
+            sql.debug('SELECT %s', number)
+        sql.warning('consulta lenta')
+        try:
+            raise ValueError('falhou')
+        except ValueError:
+            logger.exception('Erro em %s', 'açúcar')
+        handler.listener.stop()
+
+        entries = self.read()
+        self.assertEqual([entry['message'] for entry in entries],
+                         ['SELECT 0', 'SELECT 3', 'consulta lenta', 'Erro em açúcar'])
+        self.assertEqual(entries[-1]['level'], 'ERROR')
+        self.assertIn('ValueError: falhou', entries[-1]['exception'])
+
+    def test_file_is_reopened_after_external_rotation(self):
+        logger, handler = self.make_logger('inventory.tests.rotation')
+        logger.info('antes')
+        handler.listener.stop()
+        os.rename(self.path, self.path + '.1')  # como o logrotate faz
+
+        handler.listener.start()
+        logger.info('depois')
+        handler.listener.stop()
+
+        self.assertEqual([entry['message'] for entry in self.read()], ['depois'])
+
+    def test_processes_share_the_file_without_losing_lines(self):
+        code = (
+            'import logging, sys; from inventory_management.log_config import queue_handler; '
+            'handler = queue_handler(sys.argv[1], console=False); logger = logging.getLogger("p"); '
+            'logger.setLevel(logging.INFO); logger.addHandler(handler); '
+            '[logger.info("%s %s", sys.argv[2], n) for n in range(500)]; handler.listener.stop()'
+        )
+        processes = [subprocess.Popen([sys.executable, '-c', code, self.path, str(number)], env={'PATH': ''})
+                     for number in range(3)]
+        for process in processes:
+            self.assertEqual(process.wait(), 0)
+
+        self.assertEqual(len({entry['message'] for entry in self.read()}), 1500)
+
+    def test_levels_and_sampling_from_environment_strings(self):
+        config = build_logging(self.path, level='debug', levels='django.db.backends=debug, inventory=WARNING',
+                               sampling='django.db.backends=100')
+
+        self.assertEqual(config['loggers']['django.db.backends'], {'level': 'DEBUG'})
+        self.assertEqual(config['loggers']['inventory'], {'level': 'WARNING'})
+        self.assertEqual(config['filters']['sampling']['rules'], {'django.db.backends': 100})
+        self.assertEqual((config['root']['level'], config['loggers']['django']['level']), ('DEBUG', 'DEBUG'))
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('a'), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch('inventory.response_cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with mock.patch('inventory.response_cache.time.monotonic', return_value=111):
+            self.assertIs(cache.get('a'), MISSING)
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        utils.response_cache.clear()
+        patches = [
+            mock.patch('inventory.utils.check_keywords', return_value=None),
+            mock.patch('inventory.utils.normalize_message', side_effect=lambda m: m.lower()),
+            mock.patch('inventory.utils.match_intent_responses', return_value=['Olá!']),
+        ]
+        self.match = [p.start() for p in patches][-1]
+        for p in patches:
+            self.addCleanup(p.stop)
+        self.addCleanup(utils.response_cache.clear)
+
+    def test_repeated_messages_skip_similarity_search(self):
+        self.assertEqual(utils.get_response('Oi'), 'Olá!')
+        self.assertEqual(utils.get_response('OI'), 'Olá!')
+
+        self.assertEqual(self.match.call_count, 1)
+
+    def test_invalidate_intents_clears_cache(self):
+        utils.get_response('oi')
+        utils.invalidate_intents()
+        utils.get_response('oi')
+
+        self.assertEqual(self.match.call_count, 2)
+
+
+class FakeToken:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeDoc:
+    # Imita Doc do spaCy: vetor médio dos tokens (zero fora do vocabulário)
+    # e Doc.similarity, que devolve 1.0 para a mesma sequência de tokens
+    def __init__(self, text, vectors):
+        self.tokens = [FakeToken(word) for word in text.split()]
+        rows = [vectors.get(token.text, np.zeros(3)) for token in self.tokens]
+        self.vector = np.mean(rows, axis=0) if rows else np.zeros(3)
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def similarity(self, other):
+        if [t.text for t in self] == [t.text for t in other]:
+            return 1.0
+        norms = np.linalg.norm(self.vector) * np.linalg.norm(other.vector)
+        if not norms:
+            return 0.0
+        return float(self.vector @ other.vector / norms)
+
+
+class FakeNLP:
+    VECTORS = {
+        'oi': np.array([1.0, 0.1, 0.0]),
+        'ola': np.array([0.9, 0.2, 0.0]),
+        'estoque': np.array([0.0, 1.0, 0.2]),
+        'produto': np.array([0.1, 0.8, 0.5]),
+        'tchau': np.array([0.0, 0.0, 1.0]),
+    }
+    vocab = mock.Mock(vectors_length=3)
+
+    def __call__(self, text):
+        return FakeDoc(text, self.VECTORS)
+
+    def pipe(self, texts):
+        return (self(text) for text in texts)
+
+
+class PatternIndexTests(SimpleTestCase):
+    INTENTS = {'intents': [
+        {'tag': 'greeting', 'patterns': ['Oi', 'ola'], 'responses': ['Olá!']},
+        {'tag': 'stock', 'patterns': ['estoque produto', 'zzz'], 'responses': ['Estoque']},
+        {'tag': 'goodbye', 'patterns': ['tchau'], 'responses': ['Até!']},
+    ]}
+
+    def setUp(self):
+        fake = ModelRegistry()
+        fake.register('nlp', FakeNLP)
+        fake.register('intents', lambda: self.INTENTS)
+        fake.register('pattern_index', utils.build_pattern_index)
+        patcher = mock.patch('inventory.utils.registry', fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def loop_responses(self, message):
+        # Laço original: um Doc.similarity por padrão
+        nlp = FakeNLP()
+        message_doc = nlp(message.lower())
+        highest_similarity, best_tag = 0, 'not_understood'
+        for intent in self.INTENTS['intents']:
+            for pattern in intent['patterns']:
+                similarity = message_doc.similarity(nlp(pattern.lower()))
+                if similarity > highest_similarity:
+                    highest_similarity, best_tag = similarity, intent['tag']
+        if highest_similarity < 0.5:
+            return None
+        return {i['tag']: i['responses'] for i in self.INTENTS['intents']}.get(best_tag)
+
+    def test_matrix_matches_the_per_pattern_loop(self):
+        for message in ['oi', 'OLA', 'estoque', 'produto tchau', 'tchau', 'zzz', 'qwerty', '']:
+            with self.subTest(message=message):
+                self.assertEqual(utils.match_intent_responses(message), self.loop_responses(message))
+
+    def test_exact_out_of_vocabulary_pattern_matches(self):
+        self.assertEqual(utils.match_intent_responses('ZZZ'), ['Estoque'])
+
+
+def fake_worker_chat_task(message):
+    return [{'intent': 'greeting', 'probability': '0.9'}], 'Olá!'
+
+
+@override_settings(CHATBOT_INFERENCE_POOL_SIZE=0)
+class AsyncChatViewTests(SimpleTestCase):
+    def test_chat_runs_inference_off_the_request_thread(self):
+        threads = []
+
+        def fake_chat_task(message):
+            threads.append(threading.current_thread())
+            return [{'intent': 'greeting', 'probability': '0.9'}], 'Olá!'
+
+        with mock.patch('inventory.views.chat_task', fake_chat_task):
+            response = self.client.post(reverse('chat'), {'message': 'oi'}, content_type='application/json')
+
+        self.assertEqual(response.json()['response'], 'Olá!')
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    @override_settings(CHATBOT_MICROBATCH_ENABLED=True)
+    def test_chat_task_goes_through_the_microbatcher_in_threads(self):
+        utils.intent_cache.clear()
+        self.addCleanup(utils.intent_cache.clear)
+        batcher = mock.Mock()
+        batcher.submit.return_value = [{'intent': 'greeting', 'probability': '0.9'}]
+
+        with mock.patch('inventory.utils.get_batcher', return_value=batcher), \
+                mock.patch('inventory.utils.normalize_message', side_effect=str.lower), \
+                mock.patch('inventory.utils.get_response', return_value='Olá!'):
+            intents, response = chat_task('Oi')
+
+        batcher.submit.assert_called_once_with('Oi')
+        self.assertEqual((intents[0]['intent'], response), ('greeting', 'Olá!'))
+
+    @override_settings(CHATBOT_INFERENCE_POOL_SIZE=1)
+    def test_stats_come_from_the_worker_that_ran_inference(self):
+        # Um ThreadPoolExecutor no lugar dos processos: o caminho é o mesmo
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(inference_pool.reset)
+        staff = User(username='staff', is_staff=True)
+
+        with mock.patch.object(inference_pool, '_get_executor', return_value=executor), \
+                mock.patch('inventory.views.chat_task', fake_worker_chat_task):
+            self.client.post(reverse('chat'), {'message': 'oi'}, content_type='application/json')
+            request = RequestFactory().get(reverse('chat_stats'))
+            request.user = staff
+            stats = json.loads(views.chat_stats(request).content)
+
+        [(pid, worker)] = stats['processes'].items()
+        self.assertEqual(pid, str(os.getpid()))
+        self.assertIn('response_cache', worker)
+        self.assertEqual(stats['inference_pool']['pool_size'], 1)
+
+    @override_settings(CHATBOT_INFERENCE_MAX_PENDING=0)
+    def test_full_queue_returns_503(self):
+        response = self.client.post(reverse('handle_message'), {'message': 'oi'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(inference_pool.stats()['pending'], 0)
+
+
+class StockAdjustmentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.item = InventoryItem.objects.create(name='CABO HDMI', quantity=5, user=self.user)
+        self.client.force_login(self.user)
+
+    def test_increase_updates_quantity_and_logs(self):
+        self.client.post(reverse('increase-item', args=[self.item.pk]), {'quantity': 3, 'observation': 'Compra'})
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 8)
+        log = MovementLog.objects.get(item=self.item)
+        self.assertEqual((log.change, log.action_type, log.observation), (3, 'INCREASE', 'Compra'))
+
+    def test_decrease_below_zero_is_refused(self):
+        response = self.client.post(reverse('decrease-item', args=[self.item.pk]), {'quantity': 6})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'quantity', 'Estoque insuficiente: restam 5 unidades.')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 5)
+        self.assertFalse(MovementLog.objects.exists())
+
+    def test_decrease_to_zero(self):
+        self.client.post(reverse('decrease-item', args=[self.item.pk]), {'quantity': 5})
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+        self.assertEqual(MovementLog.objects.get(item=self.item).change, -5)
+
+    def test_item_deleted_during_adjustment_returns_404(self):
+        real_adjust_stock = stock.adjust_stock
+
+        def delete_then_adjust(item_id, *args, **kwargs):
+            InventoryItem.objects.filter(pk=item_id).delete()
+            return real_adjust_stock(item_id, *args, **kwargs)
+
+        for url_name in ('increase-item', 'decrease-item'):
+            with self.subTest(url_name=url_name):
+                item = InventoryItem.objects.create(name='CABO USB', quantity=5, user=self.user)
+                with mock.patch('inventory.views.adjust_stock', side_effect=delete_then_adjust):
+                    response = self.client.post(reverse(url_name, args=[item.pk]), {'quantity': 2})
+
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(MovementLog.objects.filter(change__in=[2, -2]).exists())
+
+
+class BulkMovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.cable = InventoryItem.objects.create(name='CABO HDMI', quantity=2, user=self.user)
+        self.mouse = InventoryItem.objects.create(name='MOUSE', quantity=0, user=self.user)
+        other = User.objects.create_user('other', password='secret')
+        self.foreign = InventoryItem.objects.create(name='TECLADO', quantity=9, user=other)
+        self.client.force_login(self.user)
+
+    def post(self, movements):
+        return self.client.post(reverse('bulk-movements'), {'movements': movements}, content_type='application/json')
+
+    def test_applies_lines_in_order_with_per_line_results(self):
+        response = self.post([
+            {'item_id': self.cable.pk, 'delta': 10, 'observation': 'Pallet'},
+            {'item_id': self.cable.pk, 'delta': -12},
+            {'item_id': self.mouse.pk, 'delta': -1},
+            {'item_id': self.foreign.pk, 'delta': 1},
+            {'item_id': self.mouse.pk, 'delta': 0},
+            {'item_id': self.mouse.pk, 'delta': 4, 'action_type': 'EDIT'},
+        ])
+
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['applied', 'applied', 'rejected', 'not_found', 'invalid', 'applied'])
+        self.cable.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.foreign.refresh_from_db()
+        self.assertEqual((self.cable.quantity, self.mouse.quantity, self.foreign.quantity), (0, 4, 9))
+        self.assertEqual(
+            list(MovementLog.objects.order_by('id').values_list('change', 'action_type')),
+            [(10, 'INCREASE'), (-12, 'DECREASE'), (4, 'EDIT')],
+        )
+
+    def test_stale_read_raises_conflict_and_rolls_back(self):
+        # Outro caixa zerou o estoque depois que o lote leu a quantidade 2
+        stale = mock.Mock()
+        stale.filter.return_value.values_list.return_value = [(self.cable.pk, 2, self.user.pk), (self.mouse.pk, 0, self.user.pk)]
+        InventoryItem.objects.filter(pk=self.cable.pk).update(quantity=0)
+
+        with self.assertRaises(StockConflict):
+            apply_movements(
+                [{'item_id': self.mouse.pk, 'delta': 3}, {'item_id': self.cable.pk, 'delta': -1}],
+                user=self.user, items=stale,
+            )
+
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.quantity, 0)
+        self.assertFalse(MovementLog.objects.exists())
+
+
+class ImportItemsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        Category.objects.create(name='Cabos')
+        self.client.force_login(self.user)
+
+    def test_imports_csv_in_chunks_with_add_logs(self):
+        content = (
+            'name,quantity,category\n'
+            'cabo hdmi,5,Cabos\n'
+            'mouse,2,Periféricos\n'
+            ',1,Cabos\n'
+            'teclado,x,Periféricos\n'
+            'monitor,1,\n'
+        ).encode('utf-8')
+
+        with mock.patch('inventory.views.import_items', wraps=import_items) as importer:
+            response = self.client.post(reverse('import-items'), {
+                'file': SimpleUploadedFile('itens.csv', content),
+            })
+            self.assertEqual(importer.call_args.kwargs['user'], self.user)
+
+        stats = response.json()
+        self.assertEqual((stats['processed'], stats['created'], stats['failed']), (5, 3, 2))
+        self.assertEqual(Category.objects.filter(name='Cabos').count(), 1)
+        mouse = InventoryItem.objects.get(name='MOUSE')
+        self.assertEqual((mouse.quantity, mouse.category.name, mouse.user), (2, 'Periféricos', self.user))
+        self.assertIsNone(InventoryItem.objects.get(name='MONITOR').category)
+        self.assertEqual(MovementLog.objects.filter(action_type='ADD').count(), 3)
+
+    def test_reports_progress_per_chunk(self):
+        records = ({'name': f'item {n}', 'quantity': n, 'category': 'Cabos'} for n in range(5))
+        calls = []
+
+        import_items(records, user=self.user, chunk_size=2, progress=lambda stats: calls.append(stats['created']))
+
+        self.assertEqual(calls, [2, 4, 5])
+        self.assertEqual(InventoryItem.objects.count(), 5)
+
+
+class MovementLogExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.item = InventoryItem.objects.create(name='CABO HDMI', quantity=5, user=self.user)
+        MovementLog.objects.create(item=self.item, change=5, action_type='ADD', user=self.user,
+                                   timestamp=timezone.make_aware(timezone.datetime(2024, 3, 1, 10)))
+        MovementLog.objects.create(item=self.item, change=-2, action_type='DECREASE', user=self.user,
+                                   observation='Venda, balcão',
+                                   timestamp=timezone.make_aware(timezone.datetime(2024, 3, 2, 10)))
+        other = User.objects.create_user('other', password='secret')
+        MovementLog.objects.create(item=self.item, change=1, action_type='INCREASE', user=other)
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('movement_log_export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_contains_only_own_movements(self):
+        lines = self.export().decode('utf-8').splitlines()
+
+        self.assertEqual(lines[0], 'id,timestamp,user,item_id,item,change,action_type,observation')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Venda, balcão"', lines[2])
+
+    def test_filters_and_gzip_jsonl(self):
+        content = self.export(format='jsonl', gzip='1', start='2024-03-02', end='2024-03-02', action_type='DECREASE')
+
+        records = [json.loads(line) for line in gzip.decompress(content).decode('utf-8').splitlines()]
+        self.assertEqual([(r['item'], r['change'], r['user']) for r in records], [('CABO HDMI', -2, 'clerk')])
+
+    async def test_asgi_streams_without_buffering(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('movement_log_export'), {'format': 'jsonl'})
+
+        # Iterador síncrono no ASGI seria lido por inteiro antes do envio
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode('utf-8').splitlines()), 2)
+
+    def test_invalid_filter_returns_400(self):
+        response = self.client.get(reverse('movement_log_export'), {'start': 'ontem'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class MovementLogViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        item = InventoryItem.objects.create(name='CABO HDMI', quantity=5, user=self.user)
+        moment = timezone.now()
+        # Vários logs com o mesmo timestamp para exercitar o desempate por id
+        MovementLog.objects.bulk_create([
+            MovementLog(item=item, change=n, action_type='INCREASE', user=self.user, timestamp=moment)
+            for n in range(1, 121)
+        ])
+        self.client.force_login(self.user)
+
+    def test_cursor_pages_cover_every_log_once_with_constant_queries(self):
+        seen = []
+        params = {}
+        while True:
+            with self.assertNumQueries(3):  # sessão, usuário e a página de logs
+                response = self.client.get(reverse('movement_log'), params)
+            seen.extend(log.change for log in response.context['logs'])
+            if not response.context['next_cursor']:
+                break
+            params = {'cursor': response.context['next_cursor']}
+
+        self.assertEqual(seen, list(range(120, 0, -1)))
+
+    def test_invalid_cursor_shows_error(self):
+        response = self.client.get(reverse('movement_log'), {'cursor': 'xyz'})
+
+        self.assertEqual(list(response.context['logs']), [])
+        self.assertEqual([str(m) for m in response.context['messages']], ['Cursor de paginação inválido.'])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN é específico do SQLite')
+class QueryPlanTests(TestCase):
+    """Falha se a consulta principal de alguma view voltar a varrer a tabela inteira."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.admin = User.objects.create_superuser('admin', password='secret')
+        item = InventoryItem.objects.create(name='CABO HDMI', quantity=2, user=self.user)
+        MovementLog.objects.bulk_create([
+            MovementLog(item=item, change=n % 5 - 2, action_type='EDIT', user=self.user) for n in range(60)
+        ])
+
+    def full_scans(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [row[-1] for row in cursor.fetchall()]
+        # 'VIRTUAL TABLE INDEX' é a busca no índice FTS5
+        problems = [d for d in details if re.match(r'SCAN (TABLE )?inventory_', d)
+                    and 'USING' not in d and 'VIRTUAL TABLE INDEX' not in d]
+        if ' LIMIT ' in sql and ' MATCH ' not in sql:
+            # Página ordenada com ordenação temporária lê todas as linhas antes do
+            # LIMIT (a busca FTS5 ordena por relevância só as linhas encontradas)
+            problems += [d for d in details if 'TEMP B-TREE FOR' in d and 'ORDER BY' in d]
+        return problems
+
+    def assertViewUsesIndexes(self, user, url, params=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        selects = [q['sql'] for q in context.captured_queries
+                   if q['sql'].startswith('SELECT') and 'inventory_' in q['sql']]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql), [], sql)
+
+    def test_dashboard(self):
+        self.assertViewUsesIndexes(self.user, reverse('dashboard'))
+        self.assertViewUsesIndexes(self.user, reverse('dashboard'), {'filter': 'cabo'})
+
+    def test_movement_log(self):
+        self.assertViewUsesIndexes(self.user, reverse('movement_log'))
+        response = self.client.get(reverse('movement_log'))
+        self.assertViewUsesIndexes(self.user, reverse('movement_log'), {'cursor': response.context['next_cursor']})
+        self.assertViewUsesIndexes(self.admin, reverse('movement_log'))
+
+    def test_movement_log_export(self):
+        self.assertViewUsesIndexes(self.user, reverse('movement_log_export'))
+        self.assertViewUsesIndexes(self.admin, reverse('movement_log_export'))
+
+    def test_item_filter(self):
+        # O template item_filter.html não existe no projeto: só as consultas importam
+        with mock.patch('inventory.views.render', return_value=HttpResponse()):
+            self.assertViewUsesIndexes(self.user, reverse('item-filter'))
+            self.assertViewUsesIndexes(self.user, reverse('item-filter'), {'name': 'cabo'})
+
+    def test_stock_at(self):
+        # Sem checkpoint (parte das quantidades atuais), depois com um checkpoint
+        # anterior e um posterior à data pedida
+        item = InventoryItem.objects.get()
+        for checkpoint in (False, True):
+            if checkpoint:
+                take_checkpoint()
+            for at in ('2000-01-01', '2100-01-01'):
+                for user, params in ((self.user, {}), (self.user, {'item': item.pk}), (self.admin, {})):
+                    with self.subTest(checkpoint=checkpoint, at=at, user=user.username, **params):
+                        self.assertViewUsesIndexes(user, reverse('stock_at'), {'at': at, 'format': 'json', **params})
+
+    def test_most_sold_report(self):
+        self.client.force_login(self.user)
+        for params in ({}, {'start': '2024-01-01', 'end': '2024-03-31'}):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(reverse('most_sold_items_report'), params)
+            report = [q['sql'] for q in context.captured_queries if 'SUM(' in q['sql']]
+            self.assertEqual(len(report), 1)
+
+            # O top N ordena pelo agregado: só a varredura importa aqui
+            sql = report[0].rsplit(' LIMIT ', 1)[0]
+            self.assertEqual(self.full_scans(sql), [], sql)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'PRAGMAs do SQLite')
+class SQLiteTuningTests(TestCase):
+    def test_new_connections_get_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT_MS)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_CACHE_SIZE)
+
+    def test_asgi_entry_point_disables_persistent_connections(self):
+        code = (
+            'from django.conf import settings; import inventory_management.{module}; '
+            'print(settings.DATABASES["default"]["CONN_MAX_AGE"])'
+        )
+        for module, expected in (('asgi', '0'), ('wsgi', '60')):
+            with self.subTest(module=module):
+                output = subprocess.run(
+                    [sys.executable, '-c', code.format(module=module)],
+                    capture_output=True, text=True, check=True, env={'PATH': ''},
+                ).stdout
+                self.assertEqual(output.strip(), expected)
+
+    def test_benchmark_runs_readers_and_writers(self):
+        summary = run_benchmark(pragmas(), True, 'BEGIN IMMEDIATE', processes=2, writers=1, seconds=0.2, items=100)
+
+        self.assertGreater(summary['read']['ops'], 0)
+        self.assertGreater(summary['write']['ops'], 0)
+        self.assertEqual(summary['write']['errors'], 0)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('clerk', password='secret')
+        category = Category.objects.create(name='Cabos')
+        InventoryItem.objects.bulk_create([
+            InventoryItem(name=f'ITEM {n}', quantity=n, category=category, user=self.user) for n in range(20)
+        ])
+        rebuild_low_stock()
+        self.client.force_login(self.user)
+
+    def low_stock_message(self, response):
+        return [str(m) for m in response.context['messages']]
+
+    def test_cached_request_runs_fixed_queries(self):
+        with self.assertNumQueries(5):  # sessão, usuário, total, página com categorias e baixo estoque
+            self.client.get(reverse('dashboard'))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('dashboard'), {'page': 2})
+
+        self.assertContains(response, 'Cabos')
+        self.assertEqual(response.context['items'].paginator.count, 20)
+        self.assertEqual(self.low_stock_message(response), ['4 itens estão com baixo estoque'])
+
+    def test_filtered_count_is_cached_per_filter(self):
+        rebuild_index()  # bulk_create não passa pelos sinais que indexam os itens
+        self.client.get(reverse('dashboard'), {'filter': 'item'})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('dashboard'), {'filter': 'item', 'page': 2})
+
+        self.assertEqual(response.context['items'].paginator.count, 20)
+        self.assertEqual(len(response.context['items']), 5)
+        self.assertFalse([q['sql'] for q in context.captured_queries if 'COUNT(' in q['sql']])
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('dashboard'), {'filter': 'cabos'})
+        self.assertTrue([q['sql'] for q in context.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_counts_refresh_when_inventory_changes(self):
+        self.client.get(reverse('dashboard'))
+        item = InventoryItem.objects.get(name='ITEM 10')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('decrease-item', args=[item.pk]), {'quantity': 9})
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryItem.objects.create(name='NOVO', quantity=0, user=self.user)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['items'].paginator.count, 21)
+        self.assertEqual(self.low_stock_message(response), ['6 itens estão com baixo estoque'])
+
+
+class LowStockIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(self.user)
+
+    def add_item(self, name, quantity, reorder_level=''):
+        self.client.post(reverse('add-item'), {
+            'name': name, 'quantity': quantity, 'category': Category.objects.get_or_create(name='Cabos')[0].pk,
+            'reorder_level': reorder_level,
+        })
+        return InventoryItem.objects.get(name=name)
+
+    def test_counter_follows_every_quantity_change(self):
+        item = self.add_item('CABO', 2)
+        self.assertTrue(item.low_stock)
+        self.assertEqual(low_stock_count(self.user.pk), 1)
+
+        self.client.post(reverse('increase-item', args=[item.pk]), {'quantity': 10})
+        self.assertEqual(low_stock_count(self.user.pk), 0)
+
+        self.client.post(reverse('decrease-item', args=[item.pk]), {'quantity': 11})
+        self.assertEqual(low_stock_count(self.user.pk), 1)
+
+        self.client.post(reverse('edit-item', args=[item.pk]), {
+            'name': 'CABO', 'quantity': 50, 'category': item.category_id, 'reorder_level': '',
+        })
+        self.assertEqual(low_stock_count(self.user.pk), 0)
+
+        self.client.post(reverse('decrease-item', args=[item.pk]), {'quantity': 50})
+        self.client.post(reverse('delete-item', args=[item.pk]))
+        self.assertFalse(InventoryItem.objects.exists())
+        self.assertEqual(low_stock_count(self.user.pk), 0)
+
+    def test_per_item_reorder_level(self):
+        self.add_item('PAPEL', 15, reorder_level=20)
+        self.add_item('CANETA', 15)
+        self.assertEqual(low_stock_count(self.user.pk), 1)
+
+        apply_movements([{'item_id': InventoryItem.objects.get(name='CANETA').pk, 'delta': -14}])
+        self.assertEqual(low_stock_count(self.user.pk), 2)
+
+    def test_stale_instance_save_keeps_counter_consistent(self):
+        item = self.add_item('CABO', 10)
+        stale = InventoryItem.objects.get(pk=item.pk)
+        apply_movements([{'item_id': item.pk, 'delta': -9}])
+        self.assertEqual(low_stock_count(self.user.pk), 1)
+
+        # Grava a quantidade e o low_stock=False lidos antes da saída
+        stale.save()
+        self.assertEqual(low_stock_count(self.user.pk), 0)
+        self.assertFalse(InventoryItem.objects.filter(low_stock=True).exists())
+
+        stale.quantity = 1
+        stale.save()
+        self.assertEqual(low_stock_count(self.user.pk), 1)
+
+    def test_rebuild_command(self):
+        InventoryItem.objects.bulk_create([InventoryItem(name=f'ITEM {n}', quantity=n, user=self.user) for n in range(6)])
+        self.assertEqual(low_stock_count(self.user.pk), 0)
+
+        call_command('rebuild_low_stock', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(low_stock_count(self.user.pk), 4)
+        self.assertEqual(StockSummary.objects.count(), 1)
+        self.assertEqual(InventoryItem.objects.filter(low_stock=True).count(), 4)
+
+
+class ItemSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.other = User.objects.create_user('other', password='secret')
+        self.food = Category.objects.create(name='Alimentação')
+        self.sugar = InventoryItem.objects.create(name='AÇÚCAR REFINADO', quantity=10, category=self.food, user=self.user)
+        self.coffee = InventoryItem.objects.create(name='CAFÉ', quantity=10, category=self.food, user=self.user)
+        InventoryItem.objects.create(name='AÇÚCAR MASCAVO', quantity=10, user=self.other)
+
+    def test_accent_insensitive_prefix_search(self):
+        self.assertEqual(search_item_ids(self.user.pk, 'acucar'), [self.sugar.pk])
+        self.assertEqual(search_item_ids(self.user.pk, 'Açu ref'), [self.sugar.pk])
+        self.assertEqual(search_item_ids(self.user.pk, 'cafe'), [self.coffee.pk])
+        self.assertEqual(search_item_ids(self.user.pk, '"*'), [])
+
+    def test_name_matches_rank_above_category_matches(self):
+        food_item = InventoryItem.objects.create(name='ALIMENTOS DIVERSOS', quantity=1, user=self.user)
+        self.assertEqual(search_item_ids(self.user.pk, 'aliment')[0], food_item.pk)
+        self.assertEqual(set(search_item_ids(self.user.pk, 'aliment')), {food_item.pk, self.sugar.pk, self.coffee.pk})
+
+    def test_index_follows_edits_and_deletes(self):
+        self.food.name = 'Mercearia'
+        self.food.save()
+        self.assertEqual(len(search_item_ids(self.user.pk, 'mercearia')), 2)
+
+        self.coffee.name = 'CHÁ'
+        self.coffee.save()
+        self.assertEqual(search_item_ids(self.user.pk, 'cha'), [self.coffee.pk])
+
+        self.food.delete()
+        self.assertEqual(search_item_ids(self.user.pk, 'mercearia'), [])
+        self.sugar.delete()
+        self.assertEqual(search_item_ids(self.user.pk, 'acucar'), [])
+
+    def test_search_pages_past_a_thousand_matches(self):
+        import_items(({'name': f'Parafuso {number}', 'quantity': '5'} for number in range(1010)), user=self.user)
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'), {'filter': 'parafuso', 'page': 68})
+        page = response.context['items']
+        self.assertEqual((page.paginator.count, page.number, len(page)), (1010, 68, 5))
+        self.assertTrue(any('LIMIT 5 OFFSET 1005' in query['sql'] for query in queries.captured_queries))
+        # ItemFilter lista todos os resultados, sem corte
+        self.assertEqual(len(search_item_ids(self.user.pk, 'parafuso')), 1010)
+
+    def test_dashboard_and_filter_use_the_index(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'), {'filter': 'acucar'})
+        self.assertEqual([item.pk for item in response.context['items']], [self.sugar.pk])
+        self.assertEqual(response.context['items'].paginator.count, 1)
+
+        import_items([{'name': 'Açúcar cristal', 'quantity': '5'}], user=self.user)
+        response = self.client.get(reverse('dashboard'), {'filter': 'açúcar'})
+        self.assertEqual(response.context['items'].paginator.count, 2)
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(self.user)
+        self.cable = InventoryItem.objects.create(name='CABO', quantity=100, user=self.user)
+        self.other_cable = InventoryItem.objects.create(name='CABO', quantity=100, user=self.user)
+
+    def moment(self, day):
+        return timezone.make_aware(timezone.datetime.fromisoformat(day + 'T12:00'))
+
+    def test_views_keep_rollup_and_report_in_sync(self):
+        self.client.post(reverse('decrease-item', args=[self.cable.pk]), {'quantity': 7})
+        self.client.post(reverse('decrease-item', args=[self.other_cable.pk]), {'quantity': 3})
+        self.client.post(reverse('increase-item', args=[self.cable.pk]), {'quantity': 2})
+        self.client.post(reverse('delete-item', args=[self.cable.pk]))
+
+        self.assertTrue(MovementLog.objects.filter(action_type='REMOVE', change=-95).exists())
+        response = self.client.get(reverse('most_sold_items_report'))
+        report = response.context['report']
+        # Itens com o mesmo nome ficam separados e o excluído continua no
+        # relatório; o saldo baixado na exclusão não conta como venda
+        self.assertEqual([(row['item_ref'], row['item_name'], row['total_sold']) for row in report],
+                         [(self.cable.pk, 'CABO', 7), (self.other_cable.pk, 'CABO', 3)])
+        self.assertEqual(report[0]['total_received'], 2)
+
+    def test_date_range_and_top_n(self):
+        log_movements([
+            MovementLog(item=self.cable, change=-5, action_type='DECREASE', timestamp=self.moment('2024-01-10')),
+            MovementLog(item=self.cable, change=-5, action_type='DECREASE', timestamp=self.moment('2024-01-10')),
+            MovementLog(item=self.other_cable, change=-8, action_type='DECREASE', timestamp=self.moment('2024-02-01')),
+        ])
+        self.assertEqual(DailyMovementRollup.objects.get(item_ref=self.cable.pk).movements, 2)
+
+        january = top_items(timezone.datetime(2024, 1, 1).date(), timezone.datetime(2024, 1, 31).date())
+        self.assertEqual([(row['item_ref'], row['total_sold']) for row in january], [(self.cable.pk, 10)])
+        self.assertEqual([row['item_ref'] for row in top_items(limit=1)], [self.cable.pk])
+
+        response = self.client.get(reverse('most_sold_items_report'), {'start': '2024-02-01', 'top': '5'})
+        self.assertEqual([row['item_ref'] for row in response.context['report']], [self.other_cable.pk])
+        response = self.client.get(reverse('most_sold_items_report'), {'start': '2024-02-30'})
+        self.assertEqual(response.context['report'], [])
+        self.assertEqual([str(m) for m in response.context['messages']], ['Data inválida: 2024-02-30'])
+
+    def test_rebuild_leaves_removals_out_of_outflow(self):
+        self.client.post(reverse('decrease-item', args=[self.cable.pk]), {'quantity': 3})
+        self.client.post(reverse('delete-item', args=[self.cable.pk]))
+
+        call_command('rebuild_rollup', stdout=open(os.devnull, 'w'))
+        rollup = DailyMovementRollup.objects.get(item_ref=self.cable.pk)
+        self.assertEqual((rollup.outflow, rollup.movements), (3, 2))
+
+    def test_rebuild_command_matches_incremental_rollup(self):
+        removed = InventoryItem.objects.create(name='FONTE', quantity=10, user=self.user)
+        log_movements([
+            MovementLog(item=self.cable, change=change, action_type='EDIT', timestamp=self.moment(day))
+            for change, day in [(-3, '2024-01-01'), (4, '2024-01-01'), (-1, '2024-01-02')]
+        ] + [MovementLog(item=removed, change=-4, action_type='DECREASE', timestamp=self.moment('2024-01-02'))])
+        removed_id = removed.pk
+        removed.delete()
+        expected = list(DailyMovementRollup.objects.order_by('item_ref', 'day')
+                        .values_list('item_ref', 'item_name', 'day', 'inflow', 'outflow', 'movements'))
+
+        call_command('rebuild_rollup', stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(DailyMovementRollup.objects.order_by('item_ref', 'day')
+                              .values_list('item_ref', 'item_name', 'day', 'inflow', 'outflow', 'movements')),
+                         expected)
+
+        self.assertTrue(DailyMovementRollup.objects.filter(item_ref=removed_id, item_name='FONTE', outflow=4).exists())
+
+        call_command('rebuild_rollup', since='2024-01-02', stdout=open(os.devnull, 'w'))
+        self.assertEqual(DailyMovementRollup.objects.count(), 3)
+        self.assertEqual(DailyMovementRollup.objects.get(item_ref=removed_id).item_name, 'FONTE')
+
+
+@override_settings(MOVEMENT_LOG_BUFFERED=True)
+class BufferedMovementLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(self.user)
+        self.item = InventoryItem.objects.create(name='CABO', quantity=10, user=self.user)
+        # Intervalo longo: os testes gravam o buffer com flush() na própria thread
+        self.writer = WriteBehindBuffer(audit.write_buffered, max_wait_ms=60000)
+        patcher = mock.patch.object(audit, '_writer', self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.writer.close)
+
+    def test_log_is_written_after_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('decrease-item', args=[self.item.pk]), {'quantity': 4})
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 6)
+        self.assertFalse(MovementLog.objects.exists())
+        self.assertEqual(audit.flush_movement_logs(), 1)
+        log = MovementLog.objects.get()
+        self.assertEqual((log.item_id, log.item_ref, log.change), (self.item.pk, self.item.pk, -4))
+        self.assertEqual(DailyMovementRollup.objects.get(item_ref=self.item.pk).outflow, 4)
+
+    def test_sync_switch_and_rollback(self):
+        log_movement(self.item.pk, 2, 'INCREASE', sync=True)
+        self.assertEqual(MovementLog.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                log_movement(self.item.pk, -1, 'DECREASE')
+                raise RuntimeError()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.writer.stats()['pending'], 0)
+
+    def test_item_deleted_before_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete-item', args=[self.item.pk]))
+        self.assertFalse(InventoryItem.objects.exists())
+
+        audit.flush_movement_logs()
+        log = MovementLog.objects.get()
+        self.assertEqual((log.item_id, log.item_ref, log.action_type), (None, self.item.pk, 'REMOVE'))
+
+    def test_user_deleted_before_flush(self):
+        clerk = User.objects.create_user('temp', password='secret')
+        with self.captureOnCommitCallbacks(execute=True):
+            log_movement(self.item.pk, -1, 'DECREASE', user=clerk)
+        # Excluído por outra requisição: a instância do log não fica sabendo
+        User.objects.filter(pk=clerk.pk).delete()
+
+        self.assertEqual(audit.flush_movement_logs(), 1)
+        connection.check_constraints()
+        log = MovementLog.objects.get()
+        self.assertEqual((log.user_id, log.item_id, log.change), (None, self.item.pk, -1))
+        self.assertEqual(self.writer.stats()['failures'], 0)
+
+
+class MovementArchiveTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(MOVEMENT_ARCHIVE_DIR=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.admin = User.objects.create_superuser('admin', password='secret')
+        self.cable = InventoryItem.objects.create(name='CABO', quantity=10, user=self.user)
+        self.mouse = InventoryItem.objects.create(name='MOUSE', quantity=10, user=self.user)
+        MovementLog.objects.bulk_create([
+            MovementLog(item=item, change=change, action_type='EDIT', user=self.user, timestamp=self.moment(day))
+            for item, change, day in [
+                (self.cable, 10, '2024-01-05'), (self.mouse, 10, '2024-01-20'), (self.cable, -3, '2024-02-10'),
+                (self.mouse, -1, '2024-02-11'), (self.cable, -2, '2024-04-01'),
+            ]
+        ])
+
+    def moment(self, day):
+        return timezone.make_aware(timezone.datetime.fromisoformat(day + 'T12:00'))
+
+    def test_archive_moves_old_rows_and_snapshots_balances(self):
+        archived = archive_movements(self.moment('2024-03-01'), chunk_size=2)
+
+        self.assertEqual(archived, 4)
+        self.assertEqual(list(MovementLog.objects.values_list('change', flat=True)), [-2])
+        self.assertTrue(archive_path('2024-01').exists())
+        self.assertTrue(archive_path('2024-02').exists())
+        self.assertEqual([record['change'] for record in iter_archived()], [10, 10, -3, -1])
+        # O histórico não começa em zero (soma 7 e 9, mas o estoque atual é
+        # 10 e 10): o saldo no corte vem da quantidade atual menos o que veio depois
+        self.assertEqual(dict(StockSnapshot.objects.values_list('item_ref', 'quantity')),
+                         {self.cable.pk: 12, self.mouse.pk: 10})
+        self.assertEqual(stock_at(self.moment('2024-04-02'), [self.cable.pk])[0], {self.cable.pk: 10})
+
+        archive_movements(self.moment('2024-05-01'))
+        latest = StockSnapshot.objects.filter(item_ref=self.cable.pk).latest('taken_at')
+        self.assertEqual(latest.quantity, 10)
+        self.assertFalse(MovementLog.objects.exists())
+
+    def test_repeated_chunk_is_read_once(self):
+        records = list(iter_archived())
+        archive_movements(self.moment('2024-02-01'))
+        with gzip.open(archive_path('2024-01'), 'rb') as archive:
+            data = archive.read()
+        with open(archive_path('2024-01'), 'ab') as archive:
+            archive.write(gzip.compress(data))
+
+        self.assertEqual(records, [])
+        self.assertEqual(len(list(iter_archived())), 2)
+
+    def test_export_includes_archived_rows(self):
+        archive_movements(self.moment('2024-03-01'))
+        other = User.objects.create_user('other', password='secret')
+        MovementLog.objects.create(item=self.cable, change=1, action_type='EDIT', user=other)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('movement_log_export'), {'format': 'jsonl', 'archived': '1'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['change'] for row in rows], [10, 10, -3, -1, -2])
+
+        response = self.client.get(reverse('movement_log_export'),
+                                   {'format': 'jsonl', 'archived': '1', 'item': self.mouse.pk, 'end': '2024-01-31'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['change'] for row in rows], [10])
+
+    def test_archive_view_requires_post_and_superuser(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('archive-logs')).status_code, 405)
+        self.client.post(reverse('archive-logs'), {'before': '2024-03-01'})
+        self.assertEqual(MovementLog.objects.count(), 5)
+
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('archive-logs'), {'before': '2024-03-01'}, follow=True)
+        self.assertEqual(MovementLog.objects.count(), 1)
+        self.assertIn('4 movimentações anteriores a 01/03/2024 arquivadas.',
+                      [str(m) for m in response.context['messages']])
+
+
+class StockAtTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.cable = InventoryItem.objects.create(name='CABO', quantity=7, user=self.user)
+        self.mouse = InventoryItem.objects.create(name='MOUSE', quantity=4, user=self.user)
+        log_movements([
+            MovementLog(item=item, change=change, action_type='EDIT', timestamp=self.moment(day))
+            for item, change, day in [
+                (self.cable, 10, '2024-01-05'), (self.mouse, 5, '2024-01-10'),
+                (self.cable, -3, '2024-02-10'), (self.mouse, -1, '2024-03-10'),
+            ]
+        ])
+
+    def moment(self, day):
+        return timezone.make_aware(timezone.datetime.fromisoformat(day + 'T12:00'))
+
+    def checkpoint_at(self, day):
+        with mock.patch('inventory.stock_history.timezone.now', return_value=self.moment(day)):
+            return take_checkpoint()
+
+    def test_replays_movements_without_checkpoint(self):
+        self.assertEqual(stock_at(self.moment('2024-02-01'))[0], {self.cable.pk: 10, self.mouse.pk: 5})
+        self.assertEqual(stock_at(self.moment('2024-02-11'), [self.cable.pk]), ({self.cable.pk: 7}, None))
+        self.assertEqual(stock_at(self.moment('2024-01-01'), [self.cable.pk])[0], {self.cable.pk: 0})
+
+    def test_missing_early_history_is_not_assumed_zero(self):
+        # Estoque anterior aos logs (histórico apagado): 20 unidades sem log de entrada
+        keyboard = InventoryItem.objects.create(name='TECLADO', quantity=17, user=self.user)
+        log_movements([MovementLog(item=keyboard, change=-3, action_type='EDIT', timestamp=self.moment('2024-02-10'))])
+
+        self.assertEqual(stock_at(self.moment('2024-02-01'), [keyboard.pk]), ({keyboard.pk: 20}, None))
+        self.assertEqual(stock_at(self.moment('2024-02-11'), [keyboard.pk])[0], {keyboard.pk: 17})
+
+        # Antes do primeiro checkpoint, parte dele e desfaz as movimentações
+        self.checkpoint_at('2024-03-01')
+        InventoryItem.objects.filter(pk=keyboard.pk).update(quantity=0)
+        self.assertEqual(stock_at(self.moment('2024-02-01'), [keyboard.pk]),
+                         ({keyboard.pk: 20}, self.moment('2024-03-01')))
+
+    def test_replays_only_after_nearest_checkpoint(self):
+        self.checkpoint_at('2024-03-01')
+        # Divergência proposital: se o replay lesse antes do checkpoint, o total mudaria
+        MovementLog.objects.filter(timestamp__lt=self.moment('2024-03-01')).update(change=1000)
+
+        quantities, checkpoint = stock_at(self.moment('2024-03-11'))
+        self.assertEqual(checkpoint, self.moment('2024-03-01'))
+        self.assertEqual(quantities, {self.cable.pk: 7, self.mouse.pk: 3})
+
+    def test_deleted_items_keep_their_history(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('delete-item', args=[self.cable.pk]))
+
+        self.assertEqual(MovementLog.objects.filter(item_ref=self.cable.pk).count(), 3)
+        self.assertEqual(stock_at(self.moment('2024-02-11'), [self.cable.pk])[0], {self.cable.pk: 7})
+        self.assertEqual(stock_at(timezone.now() + timezone.timedelta(seconds=1))[0], {self.mouse.pk: 4})
+
+    @override_settings(MOVEMENT_ARCHIVE_DIR=tempfile.gettempdir())
+    def test_archive_checkpoint_after_periodic_checkpoint(self):
+        self.checkpoint_at('2024-02-01')
+        with mock.patch('inventory.archiving._append'):
+            archive_movements(self.moment('2024-03-01'))
+
+        # O checkpoint do arquivamento parte das quantidades atuais, não do anterior
+        self.assertEqual(stock_at(self.moment('2024-03-01'))[0], {self.cable.pk: 7, self.mouse.pk: 5})
+        self.assertEqual(stock_at(self.moment('2024-03-11'))[0], {self.cable.pk: 7, self.mouse.pk: 4})
+        StockSnapshot.objects.filter(archived=False).delete()
+        with self.assertRaises(HistoryUnavailable):
+            stock_at(self.moment('2024-02-15'))
+
+    def test_view_returns_json_for_own_items(self):
+        other = User.objects.create_user('other', password='secret')
+        InventoryItem.objects.create(name='TECLADO', quantity=1, user=other)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('stock_at'), {'at': '2024-02-10', 'format': 'json'})
+        self.assertEqual(response.json()['items'], [
+            {'item_id': self.cable.pk, 'item': 'CABO', 'quantity': 7},
+            {'item_id': self.mouse.pk, 'item': 'MOUSE', 'quantity': 5},
+        ])
+        response = self.client.get(reverse('stock_at'), {'at': '2024-02-10', 'item': 'x', 'format': 'json'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('stock_at'), {'at': '2024-02-10T13:00'})
+        self.assertEqual([row['quantity'] for row in response.context['rows']], [7, 5])
+
+
+@override_settings(FORECAST_METHOD='sma', FORECAST_WINDOW_DAYS=10, FORECAST_LEAD_TIME_DAYS=5, FORECAST_SERVICE_Z=0)
+class DemandForecastTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.fast = InventoryItem.objects.create(name='CABO', quantity=30, user=self.user)
+        self.slow = InventoryItem.objects.create(name='MOUSE', quantity=30, user=self.user)
+        self.today = timezone.localdate()
+        # CABO: 4 por dia nos últimos 10 dias; MOUSE: 1 saída há 3 dias
+        log_movements([
+            MovementLog(item=self.fast, change=-4, action_type='DECREASE', timestamp=self.days_ago(n))
+            for n in range(10)
+        ] + [MovementLog(item=self.slow, change=-1, action_type='DECREASE', timestamp=self.days_ago(3))])
+
+    def days_ago(self, n):
+        day = self.today - timezone.timedelta(days=n)
+        return timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time().replace(hour=12)))
+
+    def test_forecast_is_vectorized_over_items(self):
+        matrix = np.array([[0, 2, 2, 2], [0, 0, 0, 0]], dtype=np.float32)
+        demand, std, cover, reorder_point = forecast(matrix, np.array([12, 5], dtype=np.float32),
+                                                     method='sma', window=3, lead_time=2, z=0)
+        self.assertEqual(demand.tolist(), [2, 0])
+        self.assertEqual(cover[0], 6)
+        self.assertTrue(np.isnan(cover[1]))
+        self.assertEqual(reorder_point.tolist(), [4, 0])
+
+        demand = forecast(matrix, np.zeros(2, dtype=np.float32), method='ewma', alpha=0.5)[0]
+        self.assertAlmostEqual(float(demand[0]), 1.75)
+
+    def test_run_stores_forecasts_and_drives_low_stock(self):
+        timings = run_forecast(end=self.today)
+
+        self.assertEqual(timings['items'], 2)
+        fast = DemandForecast.objects.get(item=self.fast)
+        self.assertEqual((fast.daily_demand, fast.reorder_point, fast.days_of_cover), (4, 20, 7.5))
+        self.fast.refresh_from_db()
+        self.assertEqual(self.fast.forecast_reorder_point, 20)
+        self.assertFalse(self.fast.low_stock)
+        self.assertEqual(DemandForecast.objects.get(item=self.slow).reorder_point, 1)
+
+        apply_movements([{'item_id': self.fast.pk, 'delta': -10}])
+        self.fast.refresh_from_db()
+        self.assertTrue(self.fast.low_stock)
+        self.assertEqual(low_stock_count(self.user.pk), 1)
+
+        # O limite definido no item tem prioridade sobre a previsão
+        self.fast.reorder_level = 5
+        self.fast.save()
+        self.assertEqual(low_stock_count(self.user.pk), 0)
+
+    def test_items_without_recent_history_lose_their_forecast(self):
+        run_forecast(end=self.today)
+        run_forecast(end=self.today + timezone.timedelta(days=400))
+
+        self.assertFalse(DemandForecast.objects.exists())
+        self.assertFalse(InventoryItem.objects.filter(forecast_reorder_point__isnull=False).exists())
+
+    def test_dashboard_shows_days_of_cover(self):
+        run_forecast(end=self.today)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, '8 dias')
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        histograms.clear()
+        self.user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(self.user)
+        InventoryItem.objects.create(name='CABO', quantity=1, user=self.user)
+
+    def timings(self, response):
+        return dict(entry.split(';', 1)[0:2] for entry in response['Server-Timing'].split(', '))
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get(reverse('dashboard'))
+
+        timings = self.timings(response)
+        self.assertIn('db', timings)
+        self.assertIn('tpl', timings)
+        self.assertIn('total', timings)
+        self.assertNotIn('keras', timings)
+        [row] = histograms.snapshot()
+        self.assertEqual((row['endpoint'], row['count']), ('dashboard', 1))
+        self.assertGreater(row['queries'], 0)
+        self.assertEqual(sum(row['buckets']), 1)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('inventory.perf', 'WARNING') as logs:
+            self.client.get(reverse('dashboard'))
+
+        record = json.loads(logs.records[0].getMessage().split(': ', 1)[1])
+        self.assertEqual((record['endpoint'], record['status']), ('dashboard', 200))
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(CHATBOT_INFERENCE_POOL_SIZE=0)
+    def test_chatbot_timings_come_back_from_the_task(self):
+        def fake_chat_task(message):
+            with timed('keyword'):
+                return [], 'Olá!'
+
+        with mock.patch('inventory.views.chat_task', fake_chat_task):
+            response = self.client.post(reverse('chat'), {'message': 'oi'}, content_type='application/json')
+
+        self.assertIn('keyword', self.timings(response))
+        self.assertEqual(run_timed(fake_chat_task, 'oi')[1]['counts'], {'keyword': 1})
+
+    async def test_async_stack_is_not_adapted_to_sync(self):
+        async def get_response(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(PerformanceMiddleware(get_response)))
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('dashboard'))
+        timings = self.timings(response)
+        self.assertIn('db', timings)
+        self.assertIn('tpl', timings)
+        self.assertEqual((await sync_to_async(histograms.snapshot)())[0]['endpoint'], 'dashboard')
+
+    def test_page_is_staff_only(self):
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(self.client.get(reverse('perf_stats')).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('perf_stats'), {'format': 'json'})
+        self.assertIn('dashboard', [row['endpoint'] for row in response.json()['endpoints']])
+        self.assertContains(self.client.get(reverse('perf_stats')), 'dashboard')
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_seeded_dataset_is_measured_and_compared(self):
+        stats = seed_dataset(items=40, movements=300, users=3, batch_size=100)
+
+        self.assertEqual(InventoryItem.objects.count(), 40)
+        self.assertEqual(MovementLog.objects.count(), 300)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(stats['movements'], 300)
+        results = run_view_benchmarks(iterations=3, names=['dashboard', 'most_sold'])
+        self.assertEqual(set(results), {'dashboard', 'most_sold'})
+        self.assertGreater(results['dashboard']['queries'], 0)
+
+        baseline = {name: dict(result, p95_ms=result['p95_ms'] / 10 - 1, queries=result['queries'] - 1)
+                    for name, result in results.items()}
+        regressions = compare(results, baseline, threshold=0.25)
+        self.assertEqual(len(regressions), 4)
+        self.assertEqual(compare(results, results, threshold=0.25), [])
+
+        # O caso do chat roda sem o pool: os caches limpos são os que ele usa
+        pool_sizes = []
+
+        def fake_chat_task(message):
+            pool_sizes.append(settings.CHATBOT_INFERENCE_POOL_SIZE)
+            return [], 'Olá!'
+
+        with mock.patch('inventory.views.chat_task', fake_chat_task):
+            self.assertIn('p95_ms', run_view_benchmarks(iterations=2, names=['chat'])['chat'])
+        self.assertEqual(pool_sizes, [0, 0, 0])
+
+    def test_only_missing_dependencies_are_skipped(self):
+        def broken():
+            raise RuntimeError('/dashboard/ respondeu 500')
+
+        def missing():
+            raise ModuleNotFoundError("No module named 'spacy'")
+
+        cases = {'broken': (broken, None), 'missing': (missing, None), 'ok': (lambda: None, None)}
+        with mock.patch('inventory.benchmarks.build_cases', return_value=cases):
+            results = run_view_benchmarks(iterations=1)
+
+        self.assertEqual(results['broken'], {'error': 'RuntimeError: /dashboard/ respondeu 500'})
+        self.assertIn('skipped', results['missing'])
+        baseline = {name: {'p95_ms': 1.0, 'queries': 0} for name in cases}
+        self.assertEqual([r.split(':')[0] for r in compare(results, baseline, threshold=0.25)], ['broken', 'missing'])
+        self.assertEqual(compare(results, {'missing': results['missing']}, threshold=0.25),
+                         ['broken: RuntimeError: /dashboard/ respondeu 500'])
@@ -7,7 +7,7 @@
 
 from django.contrib import admin
 from django.urls import path
-from .views import Index, SignUpView, Dashboard, AddItem, EditItem, DeleteItem, ItemFilter, MostSoldItemsReport, MovementLogView, DecreaseItemView, IncreaseItemView, ClearLogsView
+from .views import Index, SignUpView, Dashboard, AddItem, EditItem, DeleteItem, ItemFilter, MostSoldItemsReport, MovementLogView, DecreaseItemView, IncreaseItemView, ArchiveLogsView, BulkMovementView, ImportItemsView, MovementLogExportView, StockAtView
 from django.contrib.auth import views as auth_views
 from . import views
 from django.conf import settings
@@ -18,8 +18,9 @@ urlpatterns = [
     path('', Index.as_view(), name = 'index'),
     path('item-filter/', ItemFilter.as_view(), name = 'item-filter'),
     path('dashboard/', Dashboard.as_view(), name='dashboard'),
-    path('clear-logs/', ClearLogsView.as_view(), name='clear-logs'),
+    path('archive-logs/', ArchiveLogsView.as_view(), name='archive-logs'),
     path('add-item/', AddItem.as_view(), name = 'add-item'),
+    path('import-items/', ImportItemsView.as_view(), name='import-items'),
     path('edit-item/<int:pk>', EditItem.as_view(), name = 'edit-item'),
     path('delete-item/<int:pk>', DeleteItem.as_view(), name = 'delete-item'),
     path('signup/', SignUpView.as_view(), name ='signup'),
@@ -28,8 +29,14 @@ urlpatterns = [
     path('handle_message/', views.handle_message, name='handle_message'),
     path('update_intents/', views.update_intents_file, name='update_intents_file'),
     path('chat/', views.chat, name='chat'),
+    path('chat/batch/', views.chat_batch, name='chat_batch'),
+    path('chat/stats/', views.chat_stats, name='chat_stats'),
+    path('perf/', views.perf_stats, name='perf_stats'),
     path('report/most_sold/', MostSoldItemsReport.as_view(), name='most_sold_items_report'),
+    path('report/stock_at/', StockAtView.as_view(), name='stock_at'),
     path('movement_log/', MovementLogView.as_view(), name='movement_log'),
+    path('movement_log/export/', MovementLogExportView.as_view(), name='movement_log_export'),
     path('decrease/<int:pk>', DecreaseItemView.as_view(), name='decrease-item'),
     path('increase/<int:pk>', IncreaseItemView.as_view(), name='increase-item'),
+    path('movements/bulk/', BulkMovementView.as_view(), name='bulk-movements'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
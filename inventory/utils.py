@@ -8,40 +8,92 @@
 import numpy as np
 import json
 import pickle
-import spacy
-from nltk.tokenize import word_tokenize
-from nltk.stem import RSLPStemmer
-from tensorflow.keras.models import load_model
 import random
+import threading
 from unidecode import unidecode
+from django.conf import settings
+from .model_registry import registry
+from .keyword_matcher import KeywordTable
+from .batching import MicroBatcher
+from .response_cache import LRUCache, MISSING
+from .perf import timed
 
-# Carregar o modelo spaCy e o modelo Keras
-nlp = spacy.load('pt_core_news_lg')
-model = load_model('model/chatbot_model.keras')
-words = pickle.load(open('model/words.pkl', 'rb'))
-classes = pickle.load(open('model/classes.pkl', 'rb'))
+# spaCy, TensorFlow e NLTK são importados apenas dentro das funções de carga,
+# para que as views de estoque e os comandos de gerenciamento não paguem o
+# custo de inicializar os modelos do chatbot.
+
+def model_path(filename):
+    return str(settings.CHATBOT_MODEL_DIR / filename)
+
+def _load_nlp():
+    import spacy
+    return spacy.load('pt_core_news_lg')
+
+def _load_keras_model():
+    from tensorflow.keras.models import load_model
+    return load_model(model_path('chatbot_model.keras'))
+
+def _load_pickle(filename):
+    with open(model_path(filename), 'rb') as file:
+        return pickle.load(file)
+
+def _load_intents():
+    with open(model_path('intents.json'), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def _load_stemmer():
+    from nltk.stem import RSLPStemmer
+    return RSLPStemmer()
+
+registry.register('nlp', _load_nlp)
+registry.register('keras', _load_keras_model)
+registry.register('words', lambda: _load_pickle('words.pkl'))
+registry.register('classes', lambda: _load_pickle('classes.pkl'))
+registry.register('intents', _load_intents)
+registry.register('stemmer', _load_stemmer)
+
+def warm_up(background=True):
+    return registry.warm_up(background=background)
 
 ignore_letters = ['?', '!', '.', ',']
-stemmer = RSLPStemmer()
 
 def clean_up_sentence(sentence):
+    from nltk.tokenize import word_tokenize
+    stemmer = registry.get('stemmer')
     sentence = unidecode(sentence)
     sentence = sentence.lower()
     sentence_words = word_tokenize(sentence, language='portuguese')
     sentence_words = [stemmer.stem(word) for word in sentence_words if word not in ignore_letters]
     return sentence_words
 
-def bag_of_words(sentence):
-    sentence_words = clean_up_sentence(sentence)
-    bag = [0] * len(words)
-    for w in sentence_words:
-        if w in words:
-            bag[words.index(w)] = 1
-    return np.array(bag)
-
-def predict_class(sentence):
-    bow = bag_of_words(sentence)
-    res = model.predict(np.array([bow]))[0]
+def _build_vocabulary():
+    # Índice palavra -> posição; mantém a primeira ocorrência, como list.index
+    vocabulary = {}
+    for i, w in enumerate(registry.get('words')):
+        vocabulary.setdefault(w, i)
+    return vocabulary
+
+registry.register('vocabulary', _build_vocabulary)
+
+def normalize_message(message):
+    # Forma normalizada usada como chave dos caches: sem acentos, minúscula e com radicais
+    return ' '.join(clean_up_sentence(message))
+
+# Caches de mensagens repetidas, chaveados pela forma normalizada
+response_cache = LRUCache(maxsize=settings.CHATBOT_CACHE_SIZE, ttl=settings.CHATBOT_CACHE_TTL)
+intent_cache = LRUCache(maxsize=settings.CHATBOT_CACHE_SIZE, ttl=settings.CHATBOT_CACHE_TTL)
+
+def bag_of_words(sentence, out=None):
+    vocabulary = registry.get('vocabulary')
+    if out is None:
+        out = np.zeros(len(registry.get('words')), dtype=np.float32)
+    for w in clean_up_sentence(sentence):
+        i = vocabulary.get(w)
+        if i is not None:
+            out[i] = 1
+    return out
+
+def _interpret_prediction(res, classes):
     ERROR_THRESHOLD = 0.5
 
     results = [[i, r] for i, r in enumerate(res) if r > ERROR_THRESHOLD]
@@ -53,22 +105,152 @@ def predict_class(sentence):
     return_list = [{'intent': classes[r[0]], 'probability': str(r[1])} for r in results]
     return return_list
 
-intents_json = json.load(open('model/intents.json', 'r', encoding='utf-8'))
+def predict_classes(messages):
+    # Classifica várias mensagens em uma única passada do modelo
+    if not messages:
+        return []
+
+    with timed('keras'):
+        model = registry.get('keras')
+        classes = registry.get('classes')
+        bows = np.zeros((len(messages), len(registry.get('words'))), dtype=np.float32)
+        for row, message in enumerate(messages):
+            bag_of_words(message, out=bows[row])
 
-def load_keywords():
-    with open('model/keywords.json', 'r', encoding='utf-8') as file:
+        res = model.predict(bows, verbose=0)
+        return [_interpret_prediction(r, classes) for r in res]
+
+# Requisições concorrentes ao /chat/ são agrupadas em um único model.predict
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    predict_classes,
+                    max_batch_size=settings.CHATBOT_MICROBATCH_MAX_SIZE,
+                    max_wait_ms=settings.CHATBOT_MICROBATCH_MAX_WAIT_MS,
+                    name='chatbot-microbatcher',
+                )
+    return _batcher
+
+def predict_class(sentence, batched=None):
+    if batched is None:
+        batched = settings.CHATBOT_MICROBATCH_ENABLED
+
+    key = normalize_message(sentence)
+    intents = intent_cache.get(key)
+    if intents is MISSING:
+        if batched:
+            intents = get_batcher().submit(sentence)
+        else:
+            intents = predict_classes([sentence])[0]
+        intent_cache.set(key, intents)
+    return [dict(intent) for intent in intents]
+
+def chatbot_stats():
+    return {
+        'model_load_times': registry.load_times(),
+        'microbatch': get_batcher().stats() if _batcher is not None else None,
+        'response_cache': response_cache.stats(),
+        'intent_cache': intent_cache.stats(),
+    }
+
+def load_keywords(path=None):
+    with open(path or model_path('keywords.json'), 'r', encoding='utf-8') as file:
         data = json.load(file)
     keywords = [{'keywords': entry['keywords'], 'responses': entry['responses']} for entry in data['keywords']]
     return keywords
 
+# Palavras-chave compiladas em um autômato; o arquivo só é relido quando muda
+_keyword_table = None
+
+def get_keyword_table():
+    global _keyword_table
+    if _keyword_table is None:
+        _keyword_table = KeywordTable(model_path('keywords.json'), load_keywords)
+    return _keyword_table
+
 def check_keywords(text):
-    keywords = load_keywords()
-    text = text.lower()
-    for entry in keywords:
-        if any(keyword in text for keyword in entry['keywords']):
-            return random.choice(entry['responses'])
+    with timed('keyword'):
+        keywords, matcher = get_keyword_table().get()
+        index = matcher.match(text.lower())
+    if index is not None:
+        return random.choice(keywords[index]['responses'])
     return None
 
+# Índice de similaridade: vetores dos padrões calculados uma única vez,
+# normalizados e empilhados em uma matriz (uma linha por padrão)
+def build_pattern_index():
+    nlp = registry.get('nlp')
+    intents_json = registry.get('intents')
+    tags = []
+    patterns = []
+    for intent in intents_json['intents']:
+        for pattern in intent['patterns']:
+            tags.append(intent['tag'])
+            patterns.append(pattern.lower())
+
+    docs = list(nlp.pipe(patterns))
+    if docs:
+        matrix = np.array([doc.vector for doc in docs], dtype=np.float32)
+    else:
+        matrix = np.zeros((0, nlp.vocab.vectors_length), dtype=np.float32)
+
+    # Doc.similarity devolve 1.0 para a mesma sequência de tokens mesmo sem
+    # vetores (palavras fora do vocabulário); essas linhas são achadas pelo texto
+    exact = {}
+    for row, doc in enumerate(docs):
+        exact.setdefault(tuple(token.text for token in doc), []).append(row)
+
+    # Vetores nulos continuam nulos (similaridade 0), como em Doc.similarity
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    responses = {}
+    for intent in intents_json['intents']:
+        if intent.get('responses'):
+            responses.setdefault(intent['tag'], intent['responses'])
+
+    return {'matrix': matrix, 'tags': tags, 'exact': exact, 'responses': responses}
+
+registry.register('pattern_index', build_pattern_index)
+
+def match_intent_responses(message):
+    # Devolve a lista de respostas do intent mais parecido, ou None
+    with timed('spacy'):
+        nlp = registry.get('nlp')
+        index = registry.get('pattern_index')
+        message_doc = nlp(message.lower())
+    message_vector = message_doc.vector.astype(np.float32)
+    message_norm = np.linalg.norm(message_vector)
+
+    highest_similarity = 0
+    best_tag = 'not_understood'
+
+    if index['tags']:
+        # Similaridade de cosseno com todos os padrões em uma única multiplicação
+        if message_norm > 0:
+            similarities = index['matrix'] @ (message_vector / message_norm)
+        else:
+            similarities = np.zeros(len(index['tags']), dtype=np.float32)
+        exact_rows = index['exact'].get(tuple(token.text for token in message_doc))
+        if exact_rows:
+            similarities[exact_rows] = 1.0
+        best = int(np.argmax(similarities))
+        if similarities[best] > highest_similarity:
+            highest_similarity = float(similarities[best])
+            best_tag = index['tags'][best]
+    
+    MIN_SIMILARITY_THRESHOLD = 0.5
+    if highest_similarity < MIN_SIMILARITY_THRESHOLD:
+        return None
+    
+    return index['responses'].get(best_tag)
+
 def get_response(message):
     keyword_response = check_keywords(message)
     if keyword_response:
@@ -77,27 +259,21 @@ def get_response(message):
     if not isinstance(message, str):
         raise ValueError("A entrada deve ser uma string.")
     
-    message_doc = nlp(message.lower())
-    
-    highest_similarity = 0
-    best_tag = 'not_understood'
-    
-    for intent in intents_json['intents']:
-        for pattern in intent['patterns']:
-            pattern_doc = nlp(pattern.lower())
-            similarity = message_doc.similarity(pattern_doc)
-            if similarity > highest_similarity:
-                highest_similarity = similarity
-                best_tag = intent['tag']
-    
-    MIN_SIMILARITY_THRESHOLD = 0.5
-    if highest_similarity < MIN_SIMILARITY_THRESHOLD:
-        return "Desculpe, não consegui encontrar uma resposta para sua pergunta."
-    
-    for intent in intents_json['intents']:
-        if intent['tag'] == best_tag:
-            responses = intent.get('responses', [])
-            if responses:
-                return random.choice(responses)
+    # O cache guarda a lista de respostas, não a resposta sorteada
+    key = normalize_message(message)
+    responses = response_cache.get(key)
+    if responses is MISSING:
+        responses = match_intent_responses(message)
+        response_cache.set(key, responses)
+
+    if responses:
+        return random.choice(responses)
     
-    return "Desculpe, não consegui encontrar uma resposta para sua pergunta."
\ No newline at end of file
+    return "Desculpe, não consegui encontrar uma resposta para sua pergunta."
+
+def invalidate_intents():
+    # Chamado quando o intents.json é alterado: recarrega padrões e limpa caches
+    registry.unload('intents')
+    registry.unload('pattern_index')
+    response_cache.clear()
+    intent_cache.clear()
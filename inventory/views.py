@@ -8,22 +8,41 @@
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
-from .utils import get_response, predict_class
+from .utils import chatbot_stats, invalidate_intents
+from .perf import bucket_labels, histograms
+from .inference_pool import inference_pool, PoolBusy, get_response_task, chat_task, predict_classes_task
 from django.views.generic import TemplateView, View, CreateView, UpdateView, DeleteView, ListView
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.admin.views.decorators import staff_member_required
 from .forms import UserRegisterForm, InventoryItemForm, ItemFilterForm, DecreaseItemForm, IncreaseItemForm
 from .models import InventoryItem, Category, MovementLog
-from inventory_management.settings import LOW_QUANTITY
+from .exporting import async_chunks, export_movements, iter_movements
+from .archiving import ArchiveConflict, archive_movements, archived_movements
+from .filters import filter_movements, parse_day, parse_moment
+from .pagination import keyset_page
+from .inventory_cache import CachedCountPaginator, cached_value, count_cache_key
+from .low_stock import low_stock_count
+from .search import SearchResults, load_items, search_item_ids
+from .importing import detect_format, import_items, iter_records
+from .audit import log_movement
+from .rollup import top_items
+from .stock_history import HistoryUnavailable, item_names, stock_at
+from .stock import adjust_stock, apply_movements, InsufficientStock, StockConflict
 from django.contrib import messages
+from django.conf import settings
+import datetime
+import io
+import itertools
 import json
-from django.db.models import Sum, Q
+import os
 from django.utils import timezone
 import logging
-from django.core.paginator import Paginator
+from urllib.parse import urlencode
 
 logger = logging.getLogger(__name__)
 
@@ -34,37 +53,40 @@ class Dashboard(LoginRequiredMixin, View):
     def get(self, request):
         # Obtém o valor do filtro 'filter' da query string
         filter_value = request.GET.get('filter', '')
+        user_id = self.request.user.id
 
-        # Inicia o queryset dos itens
-        items = InventoryItem.objects.filter(user=self.request.user.id).order_by('id')
+        page_number = request.GET.get('page')  # Obtém o número da página
 
-        # Se houver valor de filtro, aplica a busca tanto no nome quanto na categoria
         if filter_value:
-            # Filtro por nome ou categoria usando Q objects para criar uma consulta mais flexível
-            items = items.filter(
-                Q(name__icontains=filter_value) | Q(category__name__icontains=filter_value)
-            )
+            # Busca no nome e na categoria pelo índice FTS5, sem acentos e por
+            # prefixo, do mais relevante para o menos relevante; o total fica em
+            # cache por usuário e filtro
+            paginator = CachedCountPaginator(SearchResults(user_id, filter_value), 15,
+                                             count_cache_key(user_id, 'dashboard', filter_value))
+            page_obj = paginator.get_page(page_number)
+            page_obj.object_list = load_items(page_obj.object_list)
+        else:
+            # Inicia o queryset dos itens, já trazendo a categoria no mesmo SELECT
+            items = InventoryItem.objects.filter(user=user_id).select_related('category', 'demandforecast').order_by('id')
 
-        # Aplica a paginação (15 itens por página)
-        paginator = Paginator(items, 15)  # 15 itens por página
-        page_number = request.GET.get('page')  # Obtém o número da página
-        page_obj = paginator.get_page(page_number)  # Obtém os itens da página atual
+            # Aplica a paginação (15 itens por página); o total fica em cache por usuário
+            paginator = CachedCountPaginator(items, 15, count_cache_key(user_id, 'dashboard'))
+            page_obj = paginator.get_page(page_number)  # Obtém os itens da página atual
 
-        # Filtra os itens com baixo estoque
-        low_inventory = InventoryItem.objects.filter(
-            user=self.request.user.id,
-            quantity__lte=LOW_QUANTITY
+        # Contador de baixo estoque mantido a cada movimentação (StockSummary)
+        low_inventory_count = cached_value(
+            count_cache_key(user_id, 'low_inventory'),
+            lambda: low_stock_count(user_id)
         )
         
-        if low_inventory.exists():  # Verifica se há itens com baixo estoque
-            low_inventory_count = low_inventory.count()
+        if low_inventory_count:  # Verifica se há itens com baixo estoque
             if low_inventory_count > 1:
                 messages.error(request, f'{low_inventory_count} itens estão com baixo estoque')
             else:
                 messages.error(request, f'{low_inventory_count} item está com baixo estoque')
 
-        # Obtém os IDs dos itens com baixo estoque
-        low_inventory_ids = low_inventory.values_list('id', flat=True)
+        # IDs dos itens da página com baixo estoque, sem nova consulta
+        low_inventory_ids = [item.id for item in page_obj if item.low_stock]
     
         # Passa os itens paginados e o filtro para o template
         return render(request, 'inventory/dashboard.html', {
@@ -85,12 +107,7 @@ class AddItem(LoginRequiredMixin, CreateView):
         response = super().form_valid(form)
         
         # Registrar movimentação
-        MovementLog.objects.create(
-            item=form.instance,
-            change=form.instance.quantity,
-            action_type='ADD',
-            user=self.request.user
-            )    
+        log_movement(form.instance.pk, form.instance.quantity, 'ADD', user=self.request.user)
 
         return response
 
@@ -134,12 +151,7 @@ class EditItem(LoginRequiredMixin, UpdateView):
         action_type = 'INCREASE' if quantity_change > 0 else 'DECREASE'
         
         # Registrar movimentação
-        MovementLog.objects.create(
-            item=form.instance,
-            change=quantity_change,
-            action_type='EDIT',
-            user=self.request.user  # Garantir que o usuário está sendo atribuído aqui
-        )
+        log_movement(form.instance.pk, quantity_change, 'EDIT', user=self.request.user)
         
         return response
 
@@ -149,21 +161,14 @@ class DeleteItem(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('dashboard')
     context_object_name = 'item'
     
-    def delete(self, request, *args, **kwargs):
-        item = self.get_object()
-        
-        if item:  # Verifica se o item não é None
-            with transaction.atomic():
-                MovementLog.objects.create(
-                    item=item,
-                    change=-item.quantity,
-                    action_type='REMOVE',
-                    user=self.request.user,
-                    observation='Item excluído'
-                )
-            
-        response = super().delete(request, *args, **kwargs)
-        
+    # No Django 4+ o DeleteView exclui em form_valid (delete() não é mais chamado no POST)
+    def form_valid(self, form):
+        item = self.object
+
+        with transaction.atomic():
+            log_movement(item.pk, -item.quantity, 'REMOVE', user=self.request.user, observation='Item excluído')
+            response = super().form_valid(form)
+
         return response
     
 class IncreaseItemView(LoginRequiredMixin, View):
@@ -181,37 +186,107 @@ class IncreaseItemView(LoginRequiredMixin, View):
             observation = form.cleaned_data['observation']
 
             if increase_amount > 0:
-                item.quantity += increase_amount
-                item.save()
-
-                MovementLog.objects.create(
-                    item=item,
-                    change=increase_amount,
-                    action_type='INCREASE',
-                    observation=observation,
-                    user=request.user
-                )
+                try:
+                    adjust_stock(item.pk, increase_amount, 'INCREASE', user=request.user, observation=observation)
+                except InventoryItem.DoesNotExist:
+                    # Item excluído entre o get_object_or_404 e o UPDATE
+                    raise Http404('Item não encontrado.')
 
             return redirect('dashboard')
 
         return render(request, 'inventory/increase_item.html', {'item': item, 'form': form})
 
-class ClearLogsView(LoginRequiredMixin, View):
-    def get(self, request):
-        MovementLog.objects.all().delete()
-        return redirect('movement_log')  
+class ArchiveLogsView(LoginRequiredMixin, View):
+    # Move o histórico antigo para os arquivos mensais em vez de apagá-lo
+    def post(self, request):
+        if not request.user.is_superuser:
+            messages.error(request, 'Apenas administradores podem arquivar logs.')
+            return redirect('movement_log')
+
+        before = request.POST.get('before')
+        try:
+            if before:
+                cutoff = parse_moment(before)
+            else:
+                cutoff = timezone.now() - datetime.timedelta(days=settings.MOVEMENT_ARCHIVE_AFTER_DAYS)
+            archived = archive_movements(cutoff)
+        except (ValueError, ArchiveConflict) as exc:
+            messages.error(request, str(exc) or 'Outro arquivamento está em andamento.')
+        else:
+            messages.success(request, f'{archived} movimentações anteriores a {timezone.localtime(cutoff):%d/%m/%Y} arquivadas.')
+        return redirect('movement_log')
 
 
 class MovementLogView(LoginRequiredMixin, View):
+    paginate_by = 50
+
     def get(self, request):
         # Verifica se o usuário é superusuário
         if request.user.is_superuser:
-            logs = MovementLog.objects.all().order_by('-timestamp')  # Admin vê todos os logs
+            logs = MovementLog.objects.all()  # Admin vê todos os logs
         else:
-            logs = MovementLog.objects.filter(user=request.user).order_by('-timestamp')  # Usuário vê apenas seus próprios logs
+            logs = MovementLog.objects.filter(user=request.user)  # Usuário vê apenas seus próprios logs
 
+        # Busca item e usuário no mesmo SELECT, apenas com as colunas exibidas
+        logs = logs.select_related('item', 'user').only(
+            'change', 'action_type', 'observation', 'timestamp', 'item__name', 'user__username'
+        )
+
+        filters = {key: request.GET.get(key, '') for key in ('start', 'end', 'user', 'item', 'action_type')}
+        try:
+            logs = filter_movements(logs, request.GET)
+            page, next_cursor = keyset_page(logs, request.GET.get('cursor'), self.paginate_by)
+        except ValueError as exc:
+            messages.error(request, str(exc))
+            page, next_cursor = [], None
+
+        filter_query = urlencode({key: value for key, value in filters.items() if value})
+
+        return render(request, 'inventory/movement_log.html', {
+            'logs': page,
+            'next_cursor': next_cursor,
+            'is_first_page': not request.GET.get('cursor'),
+            'filters': filters,
+            'filter_query': filter_query,
+            'action_choices': MovementLog.ACTION_CHOICES,
+            'archive_after_days': settings.MOVEMENT_ARCHIVE_AFTER_DAYS,
+        })
+
+
+class MovementLogExportView(LoginRequiredMixin, View):
+    CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+    def get(self, request):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in self.CONTENT_TYPES:
+            return JsonResponse({'error': 'Formato deve ser csv ou jsonl.'}, status=400)
+        compress = request.GET.get('gzip') in ('1', 'true')
+
+        if request.user.is_superuser:
+            logs = MovementLog.objects.all()
+        else:
+            logs = MovementLog.objects.filter(user=request.user)
 
-        return render(request, 'inventory/movement_log.html', {'logs': logs})
+        try:
+            logs = filter_movements(logs, request.GET)
+            records = iter_movements(logs)
+            if request.GET.get('archived') in ('1', 'true'):
+                # O arquivo só tem movimentações anteriores às da tabela
+                username = None if request.user.is_superuser else request.user.username
+                records = itertools.chain(archived_movements(request.GET, username), records)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        content = export_movements(records, fmt, compress)
+        if isinstance(request, ASGIRequest):
+            content = async_chunks(content)
+        response = StreamingHttpResponse(
+            content,
+            content_type='application/gzip' if compress else self.CONTENT_TYPES[fmt],
+        )
+        filename = f'movimentacoes.{fmt}' + ('.gz' if compress else '')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class DecreaseItemView(LoginRequiredMixin, View):
@@ -229,21 +304,61 @@ class DecreaseItemView(LoginRequiredMixin, View):
             observation = form.cleaned_data['observation']
 
             if decrease_amount > 0:
-                item.quantity -= decrease_amount
-                item.save()
-
-                MovementLog.objects.create(
-                    item=item,
-                    change=-decrease_amount,
-                    action_type='DECREASE',
-                    observation=observation,
-                    user=request.user
-                )
+                try:
+                    adjust_stock(item.pk, -decrease_amount, 'DECREASE', user=request.user, observation=observation)
+                except InsufficientStock:
+                    item.refresh_from_db(fields=['quantity'])
+                    form.add_error('quantity', f'Estoque insuficiente: restam {item.quantity} unidades.')
+                    return render(request, 'inventory/decrease_item.html', {'item': item, 'form': form})
+                except InventoryItem.DoesNotExist:
+                    raise Http404('Item não encontrado.')
 
             return redirect('dashboard')
 
         return render(request, 'inventory/decrease_item.html', {'item': item, 'form': form})
     
+class BulkMovementView(LoginRequiredMixin, View):
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'JSON inválido.'}, status=400)
+
+        movements = data.get('movements') if isinstance(data, dict) else None
+        if not isinstance(movements, list):
+            return JsonResponse({"error": "A chave 'movements' deve ser uma lista."}, status=400)
+        if len(movements) > settings.STOCK_BULK_MAX_LINES:
+            return JsonResponse({'error': f'Máximo de {settings.STOCK_BULK_MAX_LINES} movimentações por requisição.'}, status=400)
+
+        # Usuário comum só movimenta os próprios itens
+        items = InventoryItem.objects.all()
+        if not request.user.is_superuser:
+            items = items.filter(user=request.user)
+
+        try:
+            results = apply_movements(movements, user=request.user, items=items)
+        except StockConflict:
+            return JsonResponse({'error': 'O estoque foi alterado durante o processamento; envie o lote novamente.'}, status=409)
+
+        applied = sum(1 for result in results if result['status'] == 'applied')
+        return JsonResponse({'applied': applied, 'failed': len(results) - applied, 'results': results})
+
+class ImportItemsView(LoginRequiredMixin, View):
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return JsonResponse({'error': "Envie o arquivo no campo 'file'."}, status=400)
+
+        # O arquivo é lido em streaming, linha a linha, direto do upload
+        fmt = request.POST.get('format') or detect_format(upload.name)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            stats = import_items(iter_records(stream, fmt), user=request.user)
+        except UnicodeDecodeError:
+            return JsonResponse({'error': 'O arquivo deve estar em UTF-8.'}, status=400)
+
+        return JsonResponse(stats)
+
 class ItemFilter(LoginRequiredMixin, View):
     def get(self, request):
         # Captura o valor do parâmetro 'name' da URL
@@ -252,12 +367,12 @@ class ItemFilter(LoginRequiredMixin, View):
         # Filtra os itens com base no usuário
         items = InventoryItem.objects.filter(user=request.user).order_by('id')
 
-        # Aplica o filtro de nome, se o valor 'name' for fornecido
+        # Aplica a busca (nome e categoria, pelo índice FTS5), se o valor 'name' for fornecido
         if name:
-            items = items.filter(name__icontains=name)
+            items = load_items(search_item_ids(request.user.id, name))
 
         # Obtém IDs de itens com baixo estoque
-        low_inventory_ids = items.filter(quantity__lte=LOW_QUANTITY).values_list('id', flat=True)
+        low_inventory_ids = [item.id for item in items if item.low_stock]
 
         context = {
             'items': items,
@@ -267,12 +382,18 @@ class ItemFilter(LoginRequiredMixin, View):
         
         return render(request, 'inventory/item_filter.html', context)
 
+def chatbot_busy_response():
+    return JsonResponse({'error': 'O chatbot está ocupado, tente novamente em instantes.'}, status=503)
+
 @csrf_exempt
-def chatbot_response(request):
+async def chatbot_response(request):
     if request.method == 'POST':
         message = request.POST.get('message')
         if message:
-            response = get_response(message)
+            try:
+                response = await inference_pool.run(get_response_task, message)
+            except PoolBusy:
+                return chatbot_busy_response()
             return JsonResponse({'response': response})
         return JsonResponse({'error': 'No message provided'}, status=400)
     return JsonResponse({'error': 'Invalid request method'}, status=405)
@@ -281,7 +402,7 @@ def index(request):
     return render(request, 'dashboard.html')
 
 @csrf_exempt
-def handle_message(request):
+async def handle_message(request):
     if request.method == 'POST':
         data = json.loads(request.body)
         message = data.get('message', '')
@@ -289,7 +410,10 @@ def handle_message(request):
         if not message:
             return JsonResponse({'response': "Desculpe, não entendi sua mensagem."})
 
-        response = get_response(message)
+        try:
+            response = await inference_pool.run(get_response_task, message)
+        except PoolBusy:
+            return chatbot_busy_response()
         return JsonResponse({'response': response})
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
@@ -318,6 +442,8 @@ def update_intents_file(request):
                 file.seek(0)
                 json.dump(data, file, indent=4, ensure_ascii=False)
                 file.truncate()
+            invalidate_intents()
+            inference_pool.reset()
             return JsonResponse({'message': 'Intents atualizados com sucesso.'})
         except FileNotFoundError:
             return JsonResponse({'error': 'Arquivo não encontrado.'}, status=404)
@@ -326,15 +452,17 @@ def update_intents_file(request):
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
 @csrf_exempt
-def chat(request):
+async def chat(request):
     if request.method == 'POST':
         data = json.loads(request.body)
         if 'message' not in data:
             return JsonResponse({"error": "A chave 'message' é obrigatória."}, status=400)
 
         message = data['message']
-        intents = predict_class(message)
-        response = get_response(message)
+        try:
+            intents, response = await inference_pool.run(chat_task, message)
+        except PoolBusy:
+            return chatbot_busy_response()
         
         return JsonResponse({
             'intents': intents,
@@ -342,14 +470,129 @@ def chat(request):
         })
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+@csrf_exempt
+async def chat_batch(request):
+    if request.method == 'POST':
+        data = json.loads(request.body)
+        batch = data.get('messages')
+        if not isinstance(batch, list) or not all(isinstance(m, str) for m in batch):
+            return JsonResponse({"error": "A chave 'messages' deve ser uma lista de textos."}, status=400)
+        if len(batch) > settings.CHATBOT_MAX_BATCH_SIZE:
+            return JsonResponse({"error": f"Máximo de {settings.CHATBOT_MAX_BATCH_SIZE} mensagens por requisição."}, status=400)
+
+        try:
+            intents = await inference_pool.run(predict_classes_task, batch)
+        except PoolBusy:
+            return chatbot_busy_response()
+
+        return JsonResponse({
+            'results': [{'message': m, 'intents': i} for m, i in zip(batch, intents)]
+        })
+    return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+@staff_member_required
+def chat_stats(request):
+    # Caches, micro-batcher e tempos de carga são por processo: vêm de quem
+    # executa a inferência (os workers do pool ou, sem pool, este processo)
+    if settings.CHATBOT_INFERENCE_POOL_SIZE > 0:
+        processes = inference_pool.worker_stats()
+    else:
+        processes = {os.getpid(): chatbot_stats()}
+    return JsonResponse({
+        'inference_pool': inference_pool.stats(),
+        'processes': {str(pid): stats for pid, stats in processes.items()},
+    })
+
+@staff_member_required
+def perf_stats(request):
+    # Histogramas por endpoint deste processo; format=json devolve JSON
+    endpoints = histograms.snapshot()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'buckets': bucket_labels(), 'endpoints': endpoints})
+    return render(request, 'inventory/perf.html', {
+        'buckets': bucket_labels(),
+        'endpoints': endpoints,
+        'slow_request_ms': settings.PERF_SLOW_REQUEST_MS,
+    })
+
+class StockAtView(LoginRequiredMixin, View):
+    """Quantidade de um item ou de todos os itens em uma data (``?at=``),
+    reconstruída a partir dos checkpoints. ``format=json`` devolve JSON."""
+
+    def get(self, request):
+        at = request.GET.get('at', '')
+        item = request.GET.get('item', '')
+        as_json = request.GET.get('format') == 'json'
+        rows, checkpoint, error = [], None, None
+
+        if at:
+            try:
+                # Uma data sem hora inclui o dia inteiro
+                moment = parse_moment(at, end_of_day=True)
+                if item:
+                    try:
+                        item_refs = [int(item)]
+                    except ValueError:
+                        raise ValueError(f'Item inválido: {item}')
+                    if not request.user.is_superuser and not InventoryItem.objects.filter(
+                            pk=item_refs[0], user=request.user).exists():
+                        raise ValueError(f'Item inválido: {item}')
+                elif request.user.is_superuser:
+                    item_refs = None
+                else:
+                    item_refs = list(InventoryItem.objects.filter(user=request.user).values_list('id', flat=True))
+                quantities, checkpoint = stock_at(moment, item_refs)
+            except ValueError as exc:
+                error = str(exc)
+            except HistoryUnavailable:
+                error = 'As movimentações dessa data foram arquivadas; use a exportação com o arquivo.'
+            else:
+                names = item_names(quantities)
+                rows = [{'item_id': item_ref, 'item': names.get(item_ref, f'Item #{item_ref}'), 'quantity': quantity}
+                        for item_ref, quantity in sorted(quantities.items())]
+
+        if as_json:
+            if error or not at:
+                return JsonResponse({'error': error or "Informe a data em 'at'."}, status=400)
+            return JsonResponse({
+                'at': moment.isoformat(),
+                'checkpoint': checkpoint.isoformat() if checkpoint else None,
+                'items': rows,
+            })
+
+        if error:
+            messages.error(request, error)
+        return render(request, 'inventory/stock_at.html', {
+            'rows': rows,
+            'at': at,
+            'item': item,
+            'checkpoint': checkpoint,
+        })
+
+
 class MostSoldItemsReport(LoginRequiredMixin, View):
+    MAX_TOP = 100
+
     def get(self, request):
-        report = (MovementLog.objects
-                  .filter(change__lt=0)  # Somente saídas
-                  .values('item__name')
-                  .annotate(total_sold=Sum('change'))
-                  .order_by('total_sold')[:10])
-        
-        return render(request, 'inventory/most_sold_report.html', {'report': report})
+        filters = {key: request.GET.get(key, '') for key in ('start', 'end', 'top')}
+        try:
+            start = parse_day(filters['start']) if filters['start'] else None
+            end = parse_day(filters['end']) if filters['end'] else None
+            top = filters['top'] or '10'
+            top = int(top) if top.isdigit() else 0
+            if not 1 <= top <= self.MAX_TOP:
+                raise ValueError(f'O top deve ser um número entre 1 e {self.MAX_TOP}.')
+        except ValueError as exc:
+            messages.error(request, str(exc))
+            report, top = [], 10
+        else:
+            # Lê o rollup diário por item: não percorre o MovementLog
+            report = top_items(start, end, top)
+
+        return render(request, 'inventory/most_sold_report.html', {
+            'report': report,
+            'filters': filters,
+            'top': top,
+        })
 
 
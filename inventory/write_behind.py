@@ -0,0 +1,113 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Acumula registros em memória e os grava em lote com ``write_fn(itens)``.
+
+    Uma thread de fundo grava a cada ``max_wait_ms`` milissegundos, ou assim
+    que ``max_rows`` registros estiverem pendentes. Se a gravação falhar, os
+    registros voltam para o início do buffer e são tentados de novo no
+    próximo ciclo. ``close`` para a thread e grava o que restou.
+    """
+
+    def __init__(self, write_fn, max_rows=500, max_wait_ms=200, name='write-behind'):
+        self.write_fn = write_fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+        self._written = 0
+        self._flushes = 0
+        self._failures = 0
+        self._last_flush_ms = 0.0
+
+    def submit(self, item):
+        self._ensure_worker()
+        with self._lock:
+            self._pending.append(item)
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self._wake.set()
+
+    def _ensure_worker(self):
+        # Depois de um fork (ex.: gunicorn) a thread e o buffer são do processo pai
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pending = []
+                self._wake = threading.Event()
+                self._stopped = False
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.max_wait)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao gravar %s; nova tentativa no próximo ciclo', self.name)
+
+    def flush(self):
+        """Grava tudo o que está pendente; devolve a quantidade gravada."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                self.write_fn(batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                    self._failures += 1
+                raise
+            with self._lock:
+                self._written += len(batch)
+                self._flushes += 1
+                self._last_flush_ms = (time.perf_counter() - started) * 1000
+            return len(batch)
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread() and self._pid == os.getpid():
+            thread.join(timeout=self.max_wait + 5)
+        self._thread = None
+        return self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'written': self._written,
+                'flushes': self._flushes,
+                'failures': self._failures,
+                'avg_batch_size': self._written / self._flushes if self._flushes else 0.0,
+                'last_flush_ms': self._last_flush_ms,
+                'max_rows': self.max_rows,
+                'max_wait_ms': self.max_wait * 1000,
+            }
@@ -12,5 +12,16 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+# No ASGI o código síncrono roda em threads por requisição e conexões
+# persistentes ficam abertas sem reaproveitamento: o Django recomenda 0
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# Pré-carrega os modelos do chatbot só no servidor: em ready() o carregamento
+# também rodaria em migrate, testes e demais comandos de gerenciamento.
+from django.conf import settings  # noqa: E402
+
+if settings.CHATBOT_WARMUP:
+    from inventory.utils import warm_up
+    warm_up(background=True)
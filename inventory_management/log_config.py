@@ -0,0 +1,169 @@
+# ===================================================================
+# Projeto: Inventory Management
+# Autor: Henrique José Dias Pereira
+# Data: 06/11/2024
+# Direitos Autorais: © 2024 Henrique José Dias Pereira. Todos os direitos reservados.
+# ===================================================================
+
+import atexit
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+# Logging sem bloquear a requisição: os handlers da aplicação só colocam o
+# registro em uma fila; uma thread (QueueListener) grava as linhas JSON no
+# arquivo e no console.
+#
+# Vários processos gravam no mesmo arquivo (workers do gunicorn, do pool de
+# inferência e dos benchmarks), sempre em modo append. A rotação fica a cargo
+# do logrotate: renomear o arquivo entre dois processos que rotacionam por
+# conta própria perderia linhas. O WatchedFileHandler reabre o arquivo quando
+# ele é renomeado. Exemplo de /etc/logrotate.d/inventory:
+#
+#     /caminho/do/projeto/logs/inventory.jsonl {
+#         daily
+#         rotate 14
+#         compress
+#         delaycompress
+#         missingok
+#     }
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém 1 de cada N registros abaixo de WARNING dos loggers em
+    ``rules`` ({prefixo do logger: N}); avisos e erros sempre passam."""
+
+    def __init__(self, rules=None):
+        super().__init__()
+        self.rules = sorted(((name, int(every)) for name, every in (rules or {}).items()),
+                            key=lambda rule: len(rule[0]), reverse=True)
+        self._counters = {name: itertools.count() for name, _ in self.rules}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, every in self.rules:
+            if record.name == name or record.name.startswith(name + '.'):
+                return next(self._counters[name]) % every == 0
+        return True
+
+
+class JsonQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Monta a mensagem e o traceback aqui: argumentos e frames não ficam
+        # presos na fila até a thread gravar
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class BackgroundListener(QueueListener):
+    def stop(self):
+        # Pode ser chamado mais de uma vez (atexit e encerramento explícito)
+        if self._thread is not None:
+            super().stop()
+
+
+def queue_handler(filename, console=True):
+    """Fábrica usada pelo dictConfig: devolve o QueueHandler e inicia a
+    thread que grava nos handlers de destino."""
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    file_handler = WatchedFileHandler(filename, encoding='utf-8', delay=True)
+    file_handler.setFormatter(JsonFormatter())
+    targets = [file_handler]
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+        targets.append(stream_handler)
+
+    records = queue.SimpleQueue()
+    listener = BackgroundListener(records, *targets, respect_handler_level=True)
+    listener.start()
+    # Encerramento normal: grava o que ainda está na fila
+    atexit.register(listener.stop)
+
+    def restart_in_child():
+        # A thread não sobrevive a um fork (ex.: gunicorn --preload)
+        listener._thread = None
+        listener.start()
+    os.register_at_fork(after_in_child=restart_in_child)
+
+    handler = JsonQueueHandler(records)
+    handler.listener = listener
+    return handler
+
+
+def parse_rules(value, convert=str):
+    """Lê ``"logger=valor,outro.logger=valor"`` (ex.: variáveis de ambiente)."""
+    rules = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            name, setting = part.split('=', 1)
+            rules[name.strip()] = convert(setting.strip())
+    return rules
+
+
+def build_logging(filename, level='INFO', levels='', sampling='', console=True):
+    """Configuração para settings.LOGGING. ``levels`` define o nível de
+    loggers específicos e ``sampling`` quantos registros de cada logger
+    manter (1 em N), ambos no formato de ``parse_rules``."""
+    level = level.upper()
+    loggers = {
+        'django': {'level': level},
+        # Cada SQL executado gera um registro DEBUG: fica desligado a menos
+        # que LOG_LEVELS peça (de preferência com amostragem)
+        'django.db.backends': {'level': 'WARNING'},
+    }
+    for name, logger_level in parse_rules(levels, str.upper).items():
+        loggers[name] = {'level': logger_level}
+
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'filters': {
+            'sampling': {
+                '()': 'inventory_management.log_config.SamplingFilter',
+                'rules': parse_rules(sampling, int),
+            },
+        },
+        'handlers': {
+            'queue': {
+                '()': 'inventory_management.log_config.queue_handler',
+                'filename': str(filename),
+                'console': console,
+                'filters': ['sampling'],
+            },
+        },
+        'root': {'handlers': ['queue'], 'level': level},
+        'loggers': loggers,
+    }
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os, logging
 
+from .log_config import build_logging
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,28 +43,18 @@ INSTALLED_APPS = [
     "crispy_bootstrap5",
 ]
 
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'level': 'DEBUG',
-        },
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'django_debug.log',
-            'level': 'DEBUG',
-        },
-    },
-    'loggers': {
-        'django': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
-            'propagate': True,
-        },
-    },
-}
+# Logs em linhas JSON, gravados por uma thread em segundo plano
+# (inventory_management/log_config.py); a rotação é feita pelo logrotate,
+# seguro com vários processos gravando no arquivo. LOG_LEVELS ajusta loggers
+# específicos (ex.: "django.db.backends=DEBUG,inventory.perf=WARNING") e
+# LOG_SAMPLING mantém 1 de cada N registros abaixo de WARNING de um logger
+# (ex.: "django.db.backends=100")
+LOGGING = build_logging(
+    filename=os.environ.get('LOG_FILE', BASE_DIR / 'logs' / 'inventory.jsonl'),
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    levels=os.environ.get('LOG_LEVELS', ''),
+    sampling=os.environ.get('LOG_SAMPLING', ''),
+)
 
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -70,6 +62,7 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    'inventory.perf.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,7 +76,8 @@ ROOT_URLCONF = 'inventory_management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com medição do tempo de renderização (inventory.perf)
+        'BACKEND': 'inventory.perf.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -107,9 +101,51 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexões persistentes: cada worker WSGI (gunicorn) reaproveita a
+        # conexão (e os PRAGMAs já aplicados) por até CONN_MAX_AGE segundos.
+        # O asgi.py usa 0 por padrão
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Transações de escrita pegam o lock na abertura (BEGIN IMMEDIATE):
+            # com transações DEFERRED a promoção de leitura para escrita falha
+            # com "database is locked" sem respeitar o busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# PRAGMAs aplicados a cada nova conexão SQLite (inventory/sqlite_tuning.py).
+# WAL deixa leitores e o escritor trabalharem ao mesmo tempo; com WAL,
+# synchronous=NORMAL continua seguro contra corrupção e só sincroniza o disco
+# nos checkpoints
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+
+SQLITE_JOURNAL_MODE = 'WAL'
+
+SQLITE_SYNCHRONOUS = 'NORMAL'
+
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+
+SQLITE_CACHE_SIZE = -64000  # negativo: em KiB (~64 MB por conexão)
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+# Benchmarks (comando benchmark): resultados de referência e a piora de p95
+# tolerada antes de o comando falhar (0.25 = 25%)
+BENCHMARK_BASELINE = BASE_DIR / 'benchmark_baseline.json'
+
+BENCHMARK_REGRESSION_THRESHOLD = 0.25
+
+# Instrumentação por requisição (inventory.perf): cabeçalho Server-Timing,
+# log das requisições acima de SLOW_REQUEST_MS e histogramas por endpoint
+# com as últimas HISTOGRAM_SAMPLES requisições, em /perf/ (somente staff)
+PERF_ENABLED = os.environ.get('PERF_ENABLED', '1') == '1'
+
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', 500))
+
+PERF_HISTOGRAM_SAMPLES = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -158,5 +194,85 @@ LOGIN_URL = 'login'
 
 LOW_QUANTITY = 3
 
+# Contagens do dashboard (total filtrado, baixo estoque) ficam em cache até o
+# inventário do usuário mudar; o timeout só limita a vida de chaves antigas.
+# Com vários processos (gunicorn) use um cache compartilhado, como Redis ou
+# Memcached, para que a invalidação valha para todos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+INVENTORY_COUNT_CACHE_TIMEOUT = 300
+
+# Máximo de linhas aceitas por requisição em /movements/bulk/
+STOCK_BULK_MAX_LINES = 50000
+
+# Arquivamento do MovementLog: movimentações anteriores ao corte vão para
+# arquivos gzip JSONL mensais (somente acréscimo), em blocos de CHUNK_SIZE
+MOVEMENT_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+MOVEMENT_ARCHIVE_CHUNK_SIZE = 5000
+
+# Corte padrão do botão "Arquivar Logs": movimentações com mais de N dias
+MOVEMENT_ARCHIVE_AFTER_DAYS = 90
+
+# Gravação em segundo plano do MovementLog (write-behind): os logs de
+# movimentações individuais ficam em memória e são gravados em lote a cada
+# FLUSH_MS milissegundos ou FLUSH_ROWS logs. Desligado, o log é gravado na
+# mesma transação que altera a quantidade
+MOVEMENT_LOG_BUFFERED = os.environ.get('MOVEMENT_LOG_BUFFERED', '') == '1'
+
+MOVEMENT_LOG_FLUSH_MS = int(os.environ.get('MOVEMENT_LOG_FLUSH_MS', 200))
+
+MOVEMENT_LOG_FLUSH_ROWS = int(os.environ.get('MOVEMENT_LOG_FLUSH_ROWS', 500))
+
+# Previsão de demanda (comando forecast_demand): suavização exponencial das
+# saídas diárias dos últimos HISTORY_DAYS dias. O ponto de pedido cobre a
+# demanda do prazo de reposição mais um estoque de segurança de Z desvios
+FORECAST_HISTORY_DAYS = 365
+
+FORECAST_METHOD = 'ewma'  # 'ewma' ou 'sma' (média dos últimos WINDOW_DAYS dias)
+
+FORECAST_ALPHA = 0.1
+
+FORECAST_WINDOW_DAYS = 28
+
+FORECAST_LEAD_TIME_DAYS = 7
+
+FORECAST_SERVICE_Z = 1.65
+
+# Chatbot: os modelos são carregados sob demanda no primeiro uso.
+# Com CHATBOT_WARMUP=1 no ambiente do servidor, eles são pré-carregados
+# em segundo plano quando o servidor (wsgi.py/asgi.py) é iniciado.
+CHATBOT_MODEL_DIR = BASE_DIR / 'model'
+
+CHATBOT_WARMUP = os.environ.get('CHATBOT_WARMUP', '') == '1'
+
+# Limite de mensagens aceitas por chamada em /chat/batch/
+CHATBOT_MAX_BATCH_SIZE = 1000
+
+# Micro-batching do predict_class: junta requisições concorrentes por até
+# MAX_WAIT_MS milissegundos ou MAX_SIZE mensagens antes de chamar o modelo
+CHATBOT_MICROBATCH_ENABLED = True
+
+CHATBOT_MICROBATCH_MAX_SIZE = 32
+
+CHATBOT_MICROBATCH_MAX_WAIT_MS = 5
+
+# Cache LRU das respostas e intents por mensagem normalizada (TTL em segundos)
+CHATBOT_CACHE_SIZE = 1024
+
+CHATBOT_CACHE_TTL = 3600
+
+# Inferência do chatbot em um pool de processos com os modelos pré-carregados,
+# para não ocupar as threads que servem as páginas de estoque. Com 0 processos
+# a inferência roda em uma thread do próprio servidor. Acima de MAX_PENDING
+# tarefas na fila as views de chat respondem 503.
+CHATBOT_INFERENCE_POOL_SIZE = int(os.environ.get('CHATBOT_INFERENCE_POOL_SIZE', 2))
+
+CHATBOT_INFERENCE_MAX_PENDING = int(os.environ.get('CHATBOT_INFERENCE_MAX_PENDING', 64))
+
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'nice-elk-witty.ngrok-free.app', '6c34-187-85-164-95.ngrok-free.app', 'willingly-glowing-jennet.ngrok-free.app']
 CSRF_TRUSTED_ORIGINS = ['https://6c34-187-85-164-95.ngrok-free.app', 'https://willingly-glowing-jennet.ngrok-free.app']
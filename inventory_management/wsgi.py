@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
 
 application = get_wsgi_application()
+
+# Pré-carrega os modelos do chatbot só no servidor: em ready() o carregamento
+# também rodaria em migrate, testes e demais comandos de gerenciamento.
+from django.conf import settings  # noqa: E402
+
+if settings.CHATBOT_WARMUP:
+    from inventory.utils import warm_up
+    warm_up(background=True)